@@ -16,34 +16,342 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
+import threading
 import time
 import uuid
 import base64
+import io
+import json
+import zipfile
+from concurrent.futures import Future
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-import soundfile as sf
 import uvicorn
-from fastapi import FastAPI, HTTPException, Body, File, UploadFile, Form
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi import (
+    Body,
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel, Field
 
 # Importações absolutas para funcionar com o uvicorn diretamente
 try:
-    from backend.model import get_pretrained_model, language_to_models
-    from backend.document_processor import DocumentProcessor
+    from backend.model import (
+        checkout_pretrained_model,
+        get_artifact_stats,
+        get_artifact_store,
+        get_model_descriptor,
+        get_model_pool_stats,
+        get_pretrained_model,
+        hold_model,
+        language_to_models,
+        model_registry,
+        pin_model,
+        release_model,
+        unpin_model,
+    )
+    from backend.audio import (
+        check_output_format,
+        encode_audio,
+        float_to_pcm16,
+        media_type_for,
+        wav_header,
+    )
+    from backend.assets import ESPEAK_NG_DATA, ensure_asset
+    from backend.audio_cache import AudioCache
+    from backend.extraction_cache import ExtractionCache
+    from backend.cost_model import CostModel
+    from backend.document_processor import (
+        DocumentProcessor,
+        SentenceBuffer,
+        shutdown_pdf_workers,
+    )
+    from backend.inference import InferenceExecutor, InferenceQueueFull
+    from backend.jobs import JobManager
+    from backend.middleware import BodySizeLimitMiddleware
+    from backend.workers import ShardedInferenceExecutor
+    from backend import settings
 except ImportError:
     # Fallback para execução direta do diretório backend
-    from model import get_pretrained_model, language_to_models
-    from document_processor import DocumentProcessor
+    from model import (
+        checkout_pretrained_model,
+        get_artifact_stats,
+        get_artifact_store,
+        get_model_descriptor,
+        get_model_pool_stats,
+        get_pretrained_model,
+        hold_model,
+        language_to_models,
+        model_registry,
+        pin_model,
+        release_model,
+        unpin_model,
+    )
+    from audio import (
+        check_output_format,
+        encode_audio,
+        float_to_pcm16,
+        media_type_for,
+        wav_header,
+    )
+    from assets import ESPEAK_NG_DATA, ensure_asset
+    from audio_cache import AudioCache
+    from extraction_cache import ExtractionCache
+    from cost_model import CostModel
+    from document_processor import (
+        DocumentProcessor,
+        SentenceBuffer,
+        shutdown_pdf_workers,
+    )
+    from inference import InferenceExecutor, InferenceQueueFull
+    from jobs import JobManager
+    from middleware import BodySizeLimitMiddleware
+    from workers import ShardedInferenceExecutor
+    import settings
 
 # FastAPI app instance
 app = FastAPI(title="Next-gen Kaldi: Text-to-speech (TTS) API")
 
+
+def MyPrint(s):
+    now = datetime.now()
+    date_time = now.strftime("%Y-%m-%d %H:%M:%S.%f")
+    print(f"{date_time}: {s}")
+
+
+# Synthesis, model loading and audio writes run here, off the event loop
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+)
+
+# Synthesis results keyed by text, voice and speed, shared by all processes
+audio_cache: Optional[AudioCache] = None
+if settings.AUDIO_CACHE_MAX_MB > 0:
+    audio_cache = AudioCache(
+        settings.AUDIO_CACHE_DIR,
+        max_bytes=settings.AUDIO_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+# Text extracted from uploaded documents, so re-uploads are not parsed again
+extraction_cache: Optional[ExtractionCache] = None
+if settings.EXTRACTION_CACHE_MAX_MB > 0:
+    extraction_cache = ExtractionCache(
+        settings.EXTRACTION_CACHE_DIR,
+        max_bytes=settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+# In sharded mode (TTS_INFERENCE_PROCESSES > 0) synthesis runs in worker
+# processes instead, each owning a subset of the catalog. They are started on
+# startup rather than at import, because the workers import this module too.
+sharded_executor: Optional[ShardedInferenceExecutor] = None
+
+
+@app.on_event("startup")
+def open_artifact_store():
+    # Fails startup on a store without a manifest instead of the first load
+    store = get_artifact_store()
+    if store is not None:
+        MyPrint(f"Loading models from the local artifact store {store.directory}")
+
+
+@app.on_event("startup")
+def start_inference_workers():
+    global sharded_executor
+    if settings.INFERENCE_PROCESSES > 0:
+        sharded_executor = ShardedInferenceExecutor(
+            num_workers=settings.INFERENCE_PROCESSES,
+            threads_per_worker=settings.INFERENCE_WORKERS,
+            catalog=list(model_registry),
+            max_queue=settings.INFERENCE_MAX_QUEUE,
+        )
+
+
+# Synthesis seconds per model, calibrated from the document jobs that ran
+cost_model = CostModel(get_model_descriptor)
+
+
+# Whole-document synthesis jobs, checkpointed on disk per chunk
+async def synthesize_job_sentence(repo_id: str, text: str, sid: Optional[int], speed: float):
+    sample_rate, pcm, seconds = await run_inference_when_ready(
+        repo_id, synthesize_pcm16_timed, repo_id, text, sid, speed
+    )
+    cost_model.observe(repo_id, text, speed, seconds, len(pcm) / 2 / sample_rate)
+    return sample_rate, pcm
+
+
+job_manager = JobManager(
+    settings.JOBS_DIR,
+    synthesize=synthesize_job_sentence,
+    concurrency=settings.JOBS_CONCURRENCY,
+    cache=audio_cache,
+    extraction_cache=extraction_cache,
+    retention_seconds=settings.JOBS_RETENTION_HOURS * 3600,
+)
+
+
+@app.on_event("startup")
+def resume_document_jobs():
+    resumed = job_manager.resume_all()
+    if resumed:
+        MyPrint(f"Resuming {len(resumed)} document job(s): {', '.join(resumed)}")
+    job_manager.start_sweeper()
+
+
+# Models loaded and warmed up on startup (TTS_PRELOAD_MODELS). /api/ready
+# answers 503 until this is done, so no traffic reaches a cold instance, and
+# keeps answering 503 if any of them failed to load.
+preload_state: Dict[str, Any] = {"done": False, "seconds": None, "models": {}}
+preload_task: Optional[asyncio.Task] = None
+
+# Short text synthesized once per preloaded model, by language
+_WARMUP_TEXTS = {
+    "Chinese (Mandarin, 普通话)": "你好，世界。",
+    "Cantonese (粤语)": "你好，世界。",
+    "Chinese+English": "你好，世界。",
+}
+_DEFAULT_WARMUP_TEXT = "Hello world."
+
+
+def warm_up_model(repo_id: str) -> float:
+    """Load the model for repo_id and run a first synthesis, returning the seconds taken."""
+    start = time.perf_counter()
+    get_pretrained_model(repo_id)
+    # The first generate() call initializes the ONNX graph and the frontend
+    descriptor = get_model_descriptor(repo_id)
+    text = _WARMUP_TEXTS.get(descriptor.languages[0], _DEFAULT_WARMUP_TEXT)
+    with checkout_pretrained_model(repo_id=repo_id) as tts_model:
+        tts_model.generate(text, sid=0, speed=1.0)
+    return time.perf_counter() - start
+
+
+async def preload_models(repo_ids: List[str]) -> None:
+    """Warm up every model in repo_ids in parallel, then mark the instance ready."""
+    start = time.perf_counter()
+    models = preload_state["models"]
+
+    async def preload(repo_id: str) -> None:
+        models[repo_id] = {"status": "loading", "seconds": None, "error": None}
+        try:
+            get_model_descriptor(repo_id)
+            # Through the inference queue, so in sharded mode the model is
+            # loaded by the worker process that serves it
+            seconds = await run_inference_when_ready(repo_id, warm_up_model, repo_id)
+        except Exception as e:
+            MyPrint(f"Preloading {repo_id} failed: {e}")
+            models[repo_id].update(status="failed", error=str(e))
+            return
+        MyPrint(f"Preloaded {repo_id} in {seconds:.2f}s")
+        models[repo_id].update(status="ready", seconds=seconds)
+
+    await asyncio.gather(*(preload(repo_id) for repo_id in repo_ids))
+    preload_state["seconds"] = time.perf_counter() - start
+    preload_state["done"] = True
+    MyPrint(f"Model preload finished in {preload_state['seconds']:.2f}s")
+
+
+@app.on_event("startup")
+def start_model_preload():
+    global preload_task
+    if not settings.PRELOAD_MODELS:
+        preload_state["done"] = True
+        return
+    # In the background, so the server already answers liveness probes
+    preload_task = asyncio.get_running_loop().create_task(
+        preload_models(settings.PRELOAD_MODELS)
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_inference_executor():
+    if preload_task is not None:
+        preload_task.cancel()
+    # Cancel document jobs first so they are resumed, not failed, on restart
+    job_manager.shutdown()
+    inference_executor.shutdown()
+    if sharded_executor is not None:
+        sharded_executor.shutdown()
+    shutdown_pdf_workers()
+
+
+def submit_inference(repo_id: str, fn, *args) -> Future:
+    """Submit fn(*args) to run where the model for repo_id lives."""
+    if sharded_executor is not None:
+        return sharded_executor.submit(repo_id, fn, *args)
+    return inference_executor.submit(fn, *args)
+
+
+async def run_inference(repo_id: str, fn, *args):
+    return await asyncio.wrap_future(submit_inference(repo_id, fn, *args))
+
+
+async def run_inference_when_ready(repo_id: str, fn, *args):
+    """
+    Like run_inference, but waits for room instead of failing when the
+    queue is full. For background work (batches, document jobs) that
+    shares the queue with interactive requests.
+    """
+    while True:
+        try:
+            return await run_inference(repo_id, fn, *args)
+        except InferenceQueueFull:
+            await asyncio.sleep(0.05)
+
+
+class LoopSink:
+    """Sink of an in-process streaming job: puts items on an asyncio.Queue from any thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, items: asyncio.Queue):
+        self._loop = loop
+        self._items = items
+
+    def put(self, item: Any) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._items.put_nowait, item)
+        except RuntimeError:
+            # The event loop is closed: nobody is reading anymore
+            pass
+
+
+def make_stream_channel():
+    """
+    Sink and cancel event for a streaming synthesis job, the asyncio.Queue
+    the items put on the sink arrive on, and a close() to call once done.
+    Reading the items never blocks a thread.
+    """
+    items: asyncio.Queue = asyncio.Queue()
+    deliver = LoopSink(asyncio.get_running_loop(), items)
+    if sharded_executor is not None:
+        sink, cancelled, close = sharded_executor.open_stream(deliver.put)
+        return sink, cancelled, items, close
+    return deliver, threading.Event(), items, lambda: None
+
+
+# Uploads larger than this are rejected before their body is read. Added
+# before CORSMiddleware so that it runs inside it and the 413 gets CORS headers
+app.add_middleware(
+    BodySizeLimitMiddleware, max_bytes=settings.MAX_UPLOAD_MB * 1024 * 1024
+)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -64,157 +372,241 @@ app.add_middleware(
     max_age=600,  # Cache preflight requests for 10 minutes
 )
 
-# Mount static files (built frontend)
-static_dir = Path("static")
-if static_dir.exists() and static_dir.is_dir():
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+# Uploaded files stay in memory up to this size and are spooled to a
+# temporary file past it; parsers then read them from disk
+MultiPartParser.spool_max_size = settings.UPLOAD_SPOOL_MB * 1024 * 1024
 
-    # Serve frontend at root path
-    @app.get("/", include_in_schema=False)
-    async def serve_frontend():
-        return FileResponse("static/index.html")
 
-    # Catch-all route for frontend routing (SPA)
-    @app.get("/{full_path:path}", include_in_schema=False)
-    async def serve_frontend_routes(full_path: str):
-        # If the path starts with /api or /docs, let it pass through to API routes
-        if full_path.startswith(("api/", "docs", "openapi.json")):
-            raise HTTPException(status_code=404, detail="API endpoint not found")
+def resolve_speaker_id(repo_id: str, sid_str: str, language: Optional[str] = None):
+    """
+    Turn the speaker ID sent by the client into what the model expects.
 
-        # For all other paths, serve the frontend
-        file_path = static_dir / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        else:
-            # For SPA routing, return index.html
-            return FileResponse("static/index.html")
+    Args:
+        repo_id: Model the speaker ID is for
+        sid_str: Speaker ID as sent by the client, may be blank
+        language: Language the client picked the model from, checked if given
 
-else:
+    Returns:
+        The speaker ID, or None for single-speaker models
 
-    @app.get("/", include_in_schema=False)
-    async def root_redirect():
-        return RedirectResponse(url="/docs")
+    Raises:
+        ValueError: If the model or speaker ID is invalid, or the model is
+            not listed under language
+    """
+    descriptor = get_model_descriptor(repo_id)
+    if language is not None and language not in descriptor.languages:
+        raise ValueError(f"Model {repo_id} is not available for language {language}.")
 
+    if descriptor.num_speakers == 1:
+        MyPrint("This is a single-speaker model. Speaker ID is not used.")
+        return None
 
-def MyPrint(s):
-    now = datetime.now()
-    date_time = now.strftime("%Y-%m-%d %H:%M:%S.%f")
-    print(f"{date_time}: {s}")
+    if sid_str.strip() == "":
+        MyPrint("No speaker ID provided for a multi-speaker model. Defaulting to 0.")
+        return 0
+    try:
+        sid = int(sid_str)
+    except ValueError:
+        MyPrint(f"Invalid speaker ID: {sid_str}. Please input an integer for speaker ID.")
+        raise ValueError(f"Invalid speaker ID: {sid_str}. Must be an integer.")
+    # The speaker count is only unknown for models never loaded in this process
+    if sid < 0 or (descriptor.num_speakers is not None and sid >= descriptor.num_speakers):
+        raise ValueError(
+            f"Invalid speaker ID: {sid}. Model {repo_id} has {descriptor.num_speakers} speakers."
+        )
+    MyPrint(f"Using provided speaker ID: {sid}")
+    return sid
+
+
+def tts_info(language: Optional[str], repo_id: str, sid: Optional[int], speed: float) -> str:
+    return f"Generated successfully! Language: {language}, Model: {repo_id}, Speaker ID: {sid}, Speed: {speed}"
+
+
+async def tts_audio(
+    run,
+    language: str,
+    repo_id: str,
+    text: str,
+    sid_str: str,
+    speed: float,
+    output_format: str = "wav",
+):
+    """
+    Return (audio, info) for one TTS request.
+
+    A cache hit is read from storage here, off the event loop, without
+    going through the inference queue; only a miss is synthesized by
+    do_tts_processing through run (run_inference or run_inference_when_ready).
+
+    Raises:
+        ValueError: If the text is empty, or the output format, model or
+            speaker ID is invalid
+    """
+    if not text.strip():
+        MyPrint("Error: Text cannot be empty.")
+        raise ValueError("Text cannot be empty or contain only spaces.")
+    check_output_format(output_format)
+    sid = resolve_speaker_id(repo_id, sid_str, language)
+
+    if audio_cache is not None:
+        cache_key = AudioCache.key(text, repo_id, sid, speed, output_format)
+        cached = await asyncio.get_running_loop().run_in_executor(
+            None, audio_cache.get, cache_key
+        )
+        if cached is not None:
+            MyPrint(f"Serving cached audio: {cache_key}")
+            return cached, tts_info(language, repo_id, sid, speed)
+
+    return await run(
+        repo_id, do_tts_processing, language, repo_id, text, sid, speed, output_format
+    )
 
 
 # This is the core TTS processing function, used by the FastAPI endpoint
 def do_tts_processing(
-    language: str, repo_id: str, text: str, sid_str: str, speed: float
+    language: str,
+    repo_id: str,
+    text: str,
+    sid: Optional[int],
+    speed: float,
+    output_format: str = "wav",
 ):
+    """Synthesize text with the speaker ID resolved by tts_audio, and cache the result."""
     MyPrint(f"Language: {language}")
     MyPrint(f"Model ID (repo_id): {repo_id}")
     MyPrint(f"Text: {text}")
-    MyPrint(f"Speaker ID: {sid_str}")
+    MyPrint(f"Speaker ID: {sid}")
     MyPrint(f"Speed: {speed}")
 
-    if not text.strip():
-        MyPrint("Error: Text cannot be empty.")
-        raise ValueError("Text cannot be empty or contain only spaces.")
+    with checkout_pretrained_model(repo_id=repo_id) as tts_model:
+        MyPrint(f"model.py: {tts_model}")
 
-    expected_fields = language_to_models[language][repo_id]
+        try:
+            waves = tts_model.generate(
+                text, sid=sid if sid is not None else 0, speed=speed
+            ).samples
+        except Exception as e:
+            MyPrint(f"Error during TTS generation: {e}")
+            # Provide a more user-friendly error if possible, or re-raise
+            raise RuntimeError(f"Failed to generate audio: {str(e)}")
 
-    extra_col_name = None
-    if "speaker_id_col" in expected_fields:
-        extra_col_name = expected_fields["speaker_id_col"]
-        MyPrint(f"Speaker ID column: {extra_col_name}")
+        sample_rate = tts_model.sample_rate
 
-    sid = None
-    if extra_col_name is not None:
-        if sid_str.strip() == "":
-            MyPrint(
-                f"Warning: No speaker ID provided for a multi-speaker model. Defaulting to 0 or first available."
-            )
-            # Default to 0 or handle as needed, model might pick a default or error
-            # For now, let's try to pass sid as None if not provided, model loader might handle it.
-            # Or, if the model strictly requires an int, default to 0.
-            try:
-                # Attempt to get the first available speaker ID if not provided
-                if hasattr(get_pretrained_model, "get_speaker_ids") and callable(
-                    getattr(get_pretrained_model, "get_speaker_ids")
-                ):
-                    available_sids = get_pretrained_model.get_speaker_ids(repo_id)
-                    if available_sids:
-                        sid = available_sids[0]  # Use the first available ID
-                        MyPrint(f"Defaulting to first available speaker ID: {sid}")
-                    else:
-                        sid = 0  # Fallback if no specific default mechanism
-                        MyPrint(
-                            f"Could not determine available speaker IDs, defaulting speaker ID to 0."
-                        )
-                else:
-                    sid = 0  # Fallback if no specific default mechanism
-                    MyPrint(
-                        f"Speaker ID detection method not available, defaulting speaker ID to 0."
-                    )
-            except Exception as e_sid:
-                MyPrint(
-                    f"Error determining default speaker ID, defaulting to 0: {e_sid}"
-                )
-                sid = 0
-        else:
-            try:
-                sid = int(sid_str)
-                MyPrint(f"Using provided speaker ID: {sid}")
-            except ValueError:
-                MyPrint(
-                    f"Invalid speaker ID: {sid_str}. Please input an integer for speaker ID."
-                )
-                raise ValueError(f"Invalid speaker ID: {sid_str}. Must be an integer.")
-    else:
-        MyPrint("This is a single-speaker model. Speaker ID is not used.")
+    # Encoded in memory straight from the float32 samples: no temporary file
+    audio = encode_audio(waves, sample_rate, output_format)
+    MyPrint(f"Generated {len(audio)} bytes of audio")
+
+    if audio_cache is not None:
+        audio_cache.put(AudioCache.key(text, repo_id, sid, speed, output_format), audio)
+
+    return audio, tts_info(language, repo_id, sid, speed)
 
-    tts_model = get_pretrained_model(repo_id=repo_id, speed=speed)
-    MyPrint(f"model.py: {tts_model}")
 
+def stream_tts_processing(
+    language: str,
+    repo_id: str,
+    text: str,
+    sid_str: str,
+    speed: float,
+    sink,
+    cancelled,
+) -> None:
+    """
+    Synthesize text and put the audio on sink as each sentence finishes.
+
+    Puts ("start", sample_rate), then ("audio", pcm16_bytes) per segment and
+    finally ("end", info), or ("error", exception) if anything fails. Stops
+    early once the cancelled event is set (the client went away).
+    """
     try:
-        waves = tts_model.generate_with_text(text=text, sid=sid, speed=speed).samples
+        if not text.strip():
+            raise ValueError("Text cannot be empty or contain only spaces.")
+
+        sid = resolve_speaker_id(repo_id, sid_str, language)
+
+        with checkout_pretrained_model(repo_id=repo_id) as tts_model:
+            sink.put(("start", tts_model.sample_rate))
+
+            def on_segment(samples, progress) -> int:
+                sink.put(("audio", float_to_pcm16(samples)))
+                return 0 if cancelled.is_set() else 1
+
+            try:
+                tts_model.generate(
+                    text, sid=sid if sid is not None else 0, speed=speed, callback=on_segment
+                )
+            except Exception as e:
+                MyPrint(f"Error during TTS generation: {e}")
+                raise RuntimeError(f"Failed to generate audio: {str(e)}")
     except Exception as e:
-        MyPrint(f"Error during TTS generation: {e}")
-        # Provide a more user-friendly error if possible, or re-raise
-        raise RuntimeError(f"Failed to generate audio: {str(e)}")
+        sink.put(("error", e))
+        return
 
-    sample_rate = tts_model.sample_rate
-    # Save the generated audio to a temporary file
-    # Using a unique filename for each request to avoid conflicts
-    output_dir = "/tmp/tts_audio_cache"
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"tts_output_{uuid.uuid4().hex}.wav")
+    sink.put(("end", tts_info(language, repo_id, sid, speed)))
 
-    sf.write(filename, waves, samplerate=sample_rate)
-    MyPrint(f"Generated audio saved to: {filename}")
 
-    info = f"Generated successfully! Language: {language}, Model: {repo_id}, Speaker ID: {sid}, Speed: {speed}"
-    return filename, info
+def hold_model_sample_rate(repo_id: str) -> int:
+    """
+    Load the model for repo_id if needed, keep it resident until
+    release_model(repo_id), and return its sample rate.
+    """
+    return hold_model(repo_id).sample_rate
 
 
-def download_espeak_ng_data():
-    espeak_data_dir = "/tmp/espeak-ng-data"
-    if not os.path.exists(os.path.join(espeak_data_dir, "espeak-ng-data", "phontab")):
-        MyPrint("Downloading espeak-ng-data...")
-        os.makedirs(espeak_data_dir, exist_ok=True)
-        cmd = (
-            f"cd {espeak_data_dir} && "
-            f"wget -qO- https://github.com/k2-fsa/sherpa-onnx/releases/download/tts-models/espeak-ng-data.tar.bz2 | tar -xj --strip-components=1"
-        )
-        ret_code = os.system(cmd)
-        if ret_code == 0:
-            MyPrint("espeak-ng-data downloaded and extracted successfully.")
-            os.environ["ESPEAK_DATA_PATH"] = espeak_data_dir
-        else:
-            MyPrint(
-                f"Error downloading/extracting espeak-ng-data. wget/tar returned {ret_code}"
+def synthesize_pcm16(repo_id: str, text: str, sid: Optional[int], speed: float):
+    """Synthesize one piece of text, returning (sample_rate, pcm16_bytes)."""
+    with checkout_pretrained_model(repo_id=repo_id) as tts_model:
+        try:
+            audio = tts_model.generate(
+                text, sid=sid if sid is not None else 0, speed=speed
             )
-    else:
-        MyPrint("espeak-ng-data already exists.")
-        os.environ["ESPEAK_DATA_PATH"] = espeak_data_dir
+        except Exception as e:
+            MyPrint(f"Error during TTS generation: {e}")
+            raise RuntimeError(f"Failed to generate audio: {str(e)}")
+        sample_rate = tts_model.sample_rate
+    return sample_rate, float_to_pcm16(audio.samples)
+
+
+def synthesize_pcm16_timed(repo_id: str, text: str, sid: Optional[int], speed: float):
+    """synthesize_pcm16, also returning the seconds synthesis took (without queueing)."""
+    start = time.perf_counter()
+    sample_rate, pcm = synthesize_pcm16(repo_id, text, sid, speed)
+    return sample_rate, pcm, time.perf_counter() - start
+
+
+def download_espeak_ng_data():
+    try:
+        espeak_data_dir = ensure_asset(ESPEAK_NG_DATA)
+    except RuntimeError as e:
+        MyPrint(f"Error installing espeak-ng-data: {e}")
+        return
+    MyPrint(f"espeak-ng-data is in {espeak_data_dir}")
+    os.environ["ESPEAK_DATA_PATH"] = espeak_data_dir
 
 
 # --- FastAPI Endpoints ---
+@app.get("/api/health", summary="Liveness Check")
+def get_health_endpoint() -> Dict[str, Any]:
+    return {"status": "ok"}
+
+
+@app.get("/api/ready", summary="Readiness Check")
+def get_ready_endpoint():
+    """
+    200 once every startup preload succeeded; 503 until then, and for good
+    if any of them failed, with the failed repo_ids listed.
+    """
+    failed = [
+        repo_id
+        for repo_id, model in preload_state["models"].items()
+        if model["status"] == "failed"
+    ]
+    ready = preload_state["done"] and not failed
+    body = {"ready": ready, "failed": failed, **preload_state}
+    del body["done"]
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
 @app.get("/api/languages", summary="Get Available Languages")
 def get_languages_endpoint() -> List[str]:  # Renamed to avoid conflict if imported
     return list(language_to_models.keys())
@@ -227,12 +619,111 @@ def get_models_for_language_endpoint(language: str) -> List[str]:  # Renamed
     raise HTTPException(status_code=404, detail="Language not found")
 
 
+@app.get("/api/model-info", summary="Get Metadata of the Models in the Catalog")
+def get_model_info_endpoint(language: Optional[str] = None) -> List[Dict[str, Any]]:
+    if language is not None and language not in language_to_models:
+        raise HTTPException(status_code=404, detail="Language not found")
+    return [
+        descriptor.to_dict()
+        for descriptor in list(model_registry.values())
+        if language is None or language in descriptor.languages
+    ]
+
+
+@app.get("/api/model-info/{repo_id:path}", summary="Get Metadata of a Model")
+def get_model_info_for_repo_endpoint(repo_id: str) -> Dict[str, Any]:
+    try:
+        return get_model_descriptor(repo_id).to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+class ModelPinRequest(BaseModel):
+    repo_id: str
+
+
+@app.get("/api/inference", summary="Get Inference Executor Load")
+def get_inference_endpoint() -> Dict[str, Any]:
+    if sharded_executor is not None:
+        return sharded_executor.stats()
+    return inference_executor.stats()
+
+
+@app.get("/api/audio-cache", summary="Get Synthesis Result Cache Statistics")
+def get_audio_cache_endpoint() -> Dict[str, Any]:
+    if audio_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **audio_cache.stats()}
+
+
+@app.get("/api/extraction-cache", summary="Get Document Extraction Cache Statistics")
+def get_extraction_cache_endpoint() -> Dict[str, Any]:
+    if extraction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **extraction_cache.stats()}
+
+
+@app.get("/api/cost-model", summary="Get Calibrated Synthesis Cost per Model")
+def get_cost_model_endpoint() -> Dict[str, Any]:
+    return cost_model.stats()
+
+
+@app.get("/api/model-pool", summary="Get Model Pool Residency and Counters")
+async def get_model_pool_endpoint() -> Dict[str, Any]:
+    if sharded_executor is not None:
+        # Each worker process has its own pool
+        return {"workers": await sharded_executor.run_on_all(get_model_pool_stats)}
+    return get_model_pool_stats()
+
+
+@app.get("/api/artifacts", summary="Get Model Artifact Fetch Timings")
+async def get_artifacts_endpoint() -> Dict[str, Any]:
+    if sharded_executor is not None:
+        return {"workers": await sharded_executor.run_on_all(get_artifact_stats)}
+    return get_artifact_stats()
+
+
+@app.post("/api/model-pool/pin", summary="Pin a Model so it is Never Evicted")
+async def pin_model_endpoint(request: ModelPinRequest = Body(...)) -> Dict[str, Any]:
+    try:
+        await run_inference(request.repo_id, pin_model, request.repo_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
+    return await get_model_pool_endpoint()
+
+
+@app.post("/api/model-pool/unpin", summary="Allow a Pinned Model to be Evicted")
+async def unpin_model_endpoint(request: ModelPinRequest = Body(...)) -> Dict[str, Any]:
+    await run_inference(request.repo_id, unpin_model, request.repo_id)
+    return await get_model_pool_endpoint()
+
+
 class TTSRequest(BaseModel):
     language: str
     repo_id: str  # Model ID
     text: str
     sid: str  # Speaker ID (can be string initially, converted to int in processing)
     speed: float
+    # wav (16-bit PCM), flac, opus (Opus in OGG), ogg (Vorbis) or mp3
+    output_format: str = "wav"
+    # Send a WAV header right away and the PCM of each sentence as it is ready
+    stream: bool = False
+
+
+class BatchTTSItem(BaseModel):
+    language: str
+    repo_id: str
+    text: str
+    sid: str = "0"
+    speed: float = 1.0
+
+
+class BatchTTSRequest(BaseModel):
+    items: List[BatchTTSItem]
+    output_format: str = "wav"
+    # "zip": one archive with an audio file per item and a manifest.json
+    # "ndjson": one JSON line per item with base64 audio, streamed in input order
+    response_format: str = "zip"
 
 
 class DocumentProcessResponse(BaseModel):
@@ -242,19 +733,97 @@ class DocumentProcessResponse(BaseModel):
     file_type: str
 
 
+def audio_response(audio: bytes, output_format: str = "wav") -> Response:
+    media_type, extension = media_type_for(output_format)
+    return Response(
+        content=audio,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="tts_output_{uuid.uuid4().hex}.{extension}"'
+        },
+    )
+
+
+async def stream_tts_response(request: TTSRequest) -> StreamingResponse:
+    loop = asyncio.get_running_loop()
+    sink, cancelled, items, close = make_stream_channel()
+    job = submit_inference(
+        request.repo_id,
+        stream_tts_processing,
+        request.language,
+        request.repo_id,
+        request.text,
+        request.sid,
+        request.speed,
+        sink,
+        cancelled,
+    )
+    # stream_tts_processing reports its own errors on the sink; this only
+    # fires when the job itself was lost (e.g. a worker process died)
+    lost = LoopSink(loop, items)
+    job.add_done_callback(
+        lambda f: f.cancelled() or f.exception() is None or lost.put(("error", f.exception()))
+    )
+
+    # Wait for the model so errors still become a proper HTTP status
+    try:
+        kind, payload = await items.get()
+    except asyncio.CancelledError:
+        cancelled.set()
+        close()
+        raise
+    if kind == "error":
+        close()
+        raise payload
+
+    async def body():
+        try:
+            yield wav_header(payload)
+            while True:
+                kind, item = await items.get()
+                if kind == "audio":
+                    yield item
+                elif kind == "error":
+                    MyPrint(f"TTS Stream Error: {item}")
+                    break
+                else:
+                    MyPrint(f"TTS Stream: {item}")
+                    break
+        finally:
+            # The job stops at its next segment; it is not waited for, so a
+            # client that went away does not hold up this coroutine
+            cancelled.set()
+            close()
+
+    return StreamingResponse(
+        body(),
+        media_type="audio/wav",
+        headers={
+            "Content-Disposition": f'attachment; filename="tts_stream_{uuid.uuid4().hex}.wav"'
+        },
+    )
+
+
 @app.post("/api/tts", summary="Generate Text-to-Speech Audio")
 async def text_to_speech_api(request: TTSRequest = Body(...)):
     try:
-        filename, info = do_tts_processing(
+        if request.stream:
+            if request.output_format != "wav":
+                raise ValueError("Streaming responses are only available as wav.")
+            return await stream_tts_response(request)
+        audio, info = await tts_audio(
+            run_inference,
             request.language,
             request.repo_id,
             request.text,
-            request.sid,  # Pass sid as string, do_tts_processing will handle conversion/defaulting
+            request.sid,  # Pass sid as string, tts_audio will handle conversion/defaulting
             request.speed,
+            request.output_format,
         )
-        return FileResponse(
-            path=filename, media_type="audio/wav", filename=os.path.basename(filename)
-        )
+        return audio_response(audio, request.output_format)
+    except InferenceQueueFull as qf:
+        MyPrint(f"TTS API Busy: {qf}")
+        raise HTTPException(status_code=503, detail=str(qf))
     except ValueError as ve:
         MyPrint(f"TTS API Value Error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -273,18 +842,25 @@ async def process_document_api(
     file: UploadFile = File(...), max_chunk_length: Optional[int] = Form(5000)
 ):
     try:
-        # Read file content
-        file_content = await file.read()
         filename = file.filename
         file_type = os.path.splitext(filename)[1].lower().replace(".", "")
 
         MyPrint(f"Processing document: {filename}, type: {file_type}")
 
-        # Process document based on file type
-        text = DocumentProcessor.process_document(file_content, filename)
+        # Parse straight from the spooled upload, off the event loop; a
+        # document extracted before is served from the extraction cache
+        process = (
+            extraction_cache.process_document
+            if extraction_cache is not None
+            else DocumentProcessor.process_document
+        )
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(None, process, file.file, filename)
 
         # Format and chunk text for TTS
-        chunks = DocumentProcessor.format_text_for_tts(text, max_chunk_length)
+        chunks = await loop.run_in_executor(
+            None, DocumentProcessor.format_text_for_tts, text, max_chunk_length
+        )
 
         MyPrint(
             f"Document processed successfully. Extracted {len(chunks)} text chunks."
@@ -314,12 +890,22 @@ async def tts_from_chunk_api(
     text_chunk: str = Form(...),
     sid: str = Form("0"),
     speed: float = Form(1.0),
+    output_format: str = Form("wav"),
 ):
     try:
-        filename, info = do_tts_processing(language, repo_id, text_chunk, sid, speed)
-        return FileResponse(
-            path=filename, media_type="audio/wav", filename=os.path.basename(filename)
+        audio, info = await tts_audio(
+            run_inference,
+            language,
+            repo_id,
+            text_chunk,
+            sid,
+            speed,
+            output_format,
         )
+        return audio_response(audio, output_format)
+    except InferenceQueueFull as qf:
+        MyPrint(f"TTS Chunk API Busy: {qf}")
+        raise HTTPException(status_code=503, detail=str(qf))
     except ValueError as ve:
         MyPrint(f"TTS Chunk API Value Error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -328,6 +914,348 @@ async def tts_from_chunk_api(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+async def run_batch_item(item: BatchTTSItem, output_format: str, slots: asyncio.Semaphore):
+    async with slots:
+        return await tts_audio(
+            run_inference_when_ready,
+            item.language,
+            item.repo_id,
+            item.text,
+            item.sid,
+            item.speed,
+            output_format,
+        )
+
+
+def build_batch_zip(results: List[Dict[str, Any]], output_format: str) -> bytes:
+    _, extension = media_type_for(output_format)
+    buffer = io.BytesIO()
+    manifest = []
+    # Audio is already compressed (or small PCM), so store without deflating
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for result in results:
+            entry = {"index": result["index"], "repo_id": result["repo_id"]}
+            if "audio" in result:
+                name = f"{result['index']:05d}.{extension}"
+                archive.writestr(name, result["audio"])
+                entry["file"] = name
+            else:
+                entry["error"] = result["error"]
+            manifest.append(entry)
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return buffer.getvalue()
+
+
+@app.post("/api/tts/batch", summary="Generate Text-to-Speech Audio for Many Prompts")
+async def batch_text_to_speech_api(request: BatchTTSRequest = Body(...)):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items cannot be empty.")
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch.",
+        )
+    if request.response_format not in ("zip", "ndjson"):
+        raise HTTPException(status_code=400, detail="response_format must be zip or ndjson.")
+    try:
+        check_output_format(request.output_format)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    MyPrint(f"Batch TTS: {len(request.items)} items")
+
+    # Submit grouped by model, in order of first appearance, so each model
+    # is loaded once and its items run back to back across the pool.
+    order = {}
+    for item in request.items:
+        order.setdefault(item.repo_id, len(order))
+    by_model = sorted(
+        range(len(request.items)), key=lambda i: order[request.items[i].repo_id]
+    )
+    slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    tasks: List[Optional[asyncio.Future]] = [None] * len(request.items)
+    for index in by_model:
+        tasks[index] = asyncio.ensure_future(
+            run_batch_item(request.items[index], request.output_format, slots)
+        )
+
+    async def result_for(index: int) -> Dict[str, Any]:
+        result = {"index": index, "repo_id": request.items[index].repo_id}
+        try:
+            result["audio"], _ = await tasks[index]
+        except Exception as e:
+            MyPrint(f"Batch TTS item {index} failed: {e}")
+            result["error"] = str(e)
+        return result
+
+    if request.response_format == "ndjson":
+        media_type, _ = media_type_for(request.output_format)
+
+        async def lines():
+            try:
+                for index in range(len(tasks)):
+                    result = await result_for(index)
+                    if "audio" in result:
+                        result["media_type"] = media_type
+                        result["audio"] = base64.b64encode(result["audio"]).decode("ascii")
+                    yield json.dumps(result) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = [await result_for(index) for index in range(len(tasks))]
+    archive = await asyncio.get_running_loop().run_in_executor(
+        None, build_batch_zip, results, request.output_format
+    )
+    return Response(
+        content=archive,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="tts_batch_{uuid.uuid4().hex}.zip"'
+        },
+    )
+
+
+@app.post("/api/jobs", status_code=202, summary="Start Synthesizing a Whole Document")
+async def create_job_api(
+    file: UploadFile = File(...),
+    language: str = Form(...),
+    repo_id: str = Form(...),
+    sid: str = Form("0"),
+    speed: float = Form(1.0),
+    output_format: str = Form("wav"),
+    max_chunk_length: int = Form(5000),
+    chunking: str = Form("length"),
+    target_chunk_seconds: float = Form(settings.JOB_CHUNK_SECONDS),
+) -> Dict[str, Any]:
+    """
+    Upload a document (PDF, DOCX, PPTX, TXT) and synthesize it on the server.
+
+    With chunking "length" chunks hold up to max_chunk_length characters.
+    With chunking "cost" they are sized to take about target_chunk_seconds
+    to synthesize with this model (see GET /api/cost-model), so parallel
+    chunks finish at about the same time.
+
+    Returns the job right away; poll GET /api/jobs/{job_id} for progress and
+    download GET /api/jobs/{job_id}/audio once its status is "done".
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in DocumentProcessor.SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {extension}")
+    if max_chunk_length <= 0:
+        raise HTTPException(status_code=400, detail="max_chunk_length must be positive.")
+    if chunking not in ("length", "cost"):
+        raise HTTPException(status_code=400, detail="chunking must be length or cost.")
+    if target_chunk_seconds <= 0 or speed <= 0:
+        raise HTTPException(status_code=400, detail="target_chunk_seconds and speed must be positive.")
+    try:
+        check_output_format(output_format)
+        resolved_sid = resolve_speaker_id(repo_id, sid, language)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    job = await asyncio.get_running_loop().run_in_executor(
+        None,
+        job_manager.create,
+        file.filename,
+        file.file,
+        {
+            "language": language,
+            "repo_id": repo_id,
+            "sid": resolved_sid,
+            "speed": speed,
+            "output_format": output_format,
+            "max_chunk_length": max_chunk_length,
+            "chunking": chunking,
+            # Fixed when the job is created, so a resumed job cuts the same chunks
+            "max_chunk_cost": target_chunk_seconds * speed / cost_model.seconds_per_unit(repo_id),
+        },
+    )
+    job_manager.start(job["id"])
+    MyPrint(f"Document job {job['id']} created for {file.filename}")
+    return job_manager.get(job["id"])
+
+
+@app.get("/api/jobs/{job_id}", summary="Get Document Job Status and Progress")
+def get_job_api(job_id: str) -> Dict[str, Any]:
+    try:
+        return job_manager.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@app.get("/api/jobs/{job_id}/audio", summary="Download the Audio of a Finished Document Job")
+def get_job_audio_api(job_id: str):
+    try:
+        job = job_manager.get(job_id)
+        path = job_manager.audio_path(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if path is None:
+        detail = f"Job is {job['status']}"
+        if job["error"]:
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    media_type, extension = media_type_for(job["output_format"])
+    stem = os.path.splitext(job["filename"])[0] or "document"
+    return FileResponse(path, media_type=media_type, filename=f"{stem}.{extension}")
+
+
+@app.delete("/api/jobs/{job_id}", summary="Cancel and Delete a Document Job")
+async def delete_job_api(job_id: str) -> Dict[str, Any]:
+    try:
+        await job_manager.delete(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"id": job_id, "deleted": True}
+
+
+@app.websocket("/api/tts/ws")
+async def tts_websocket(websocket: WebSocket):
+    """
+    Incremental text-in / audio-out synthesis.
+
+    The first message configures the session:
+        {"language": ..., "repo_id": ..., "sid": "0", "speed": 1.0}
+    then the client sends text as it is produced:
+        {"text": "fragment"}, optionally with "flush": true to synthesize
+        the buffered tail, or "end": true to flush and finish.
+
+    For every completed sentence the server sends a JSON message
+        {"type": "audio", "index": n, "text": ..., "sample_rate": ...,
+         "num_bytes": ...}
+    followed by a binary message with the 16-bit PCM. Sentences are
+    synthesized while the client keeps sending text. A message that is not
+    a JSON object gets {"type": "error", "detail": ...} and the session
+    goes on. The model stays resident until the connection closes.
+    """
+    await websocket.accept()
+    try:
+        config = await websocket.receive_json()
+        repo_id = config["repo_id"]
+        speed = float(config.get("speed", 1.0))
+        sid = resolve_speaker_id(
+            repo_id, str(config.get("sid", "0")), config.get("language")
+        )
+        # Load the model once up front so the first sentence only pays for
+        # synthesis, and keep it resident for the whole session
+        sample_rate = await run_inference(repo_id, hold_model_sample_rate, repo_id)
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        MyPrint(f"TTS WebSocket Setup Error: {e}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    async def synthesize_sentences():
+        index = 0
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return
+            try:
+                sample_rate, pcm = await run_inference(
+                    repo_id, synthesize_pcm16, repo_id, sentence, sid, speed
+                )
+            except Exception as e:
+                MyPrint(f"TTS WebSocket Synthesis Error: {e}")
+                await websocket.send_json(
+                    {"type": "error", "index": index, "text": sentence, "detail": str(e)}
+                )
+            else:
+                await websocket.send_json(
+                    {
+                        "type": "audio",
+                        "index": index,
+                        "text": sentence,
+                        "sample_rate": sample_rate,
+                        "num_bytes": len(pcm),
+                    }
+                )
+                await websocket.send_bytes(pcm)
+            index += 1
+
+    synthesizer: Optional[asyncio.Future] = None
+    try:
+        await websocket.send_json(
+            {"type": "ready", "repo_id": repo_id, "sid": sid, "sample_rate": sample_rate}
+        )
+        MyPrint(f"TTS WebSocket session started: {repo_id}, Speaker ID: {sid}")
+
+        synthesizer = asyncio.ensure_future(synthesize_sentences())
+        buffer = SentenceBuffer()
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                message = None
+            if not isinstance(message, dict) or not isinstance(message.get("text", ""), str):
+                await websocket.send_json(
+                    {
+                        "type": "error",
+                        "detail": 'Messages must be JSON objects such as {"text": "..."}.',
+                    }
+                )
+                continue
+            for sentence in buffer.feed(message.get("text", "")):
+                sentences.put_nowait(sentence)
+            if message.get("flush") or message.get("end"):
+                for sentence in buffer.flush():
+                    sentences.put_nowait(sentence)
+            if message.get("end"):
+                break
+
+        sentences.put_nowait(None)
+        await synthesizer
+        await websocket.send_json({"type": "end"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if synthesizer is not None:
+            synthesizer.cancel()
+        # Shielded: the hold is released even when this handler is cancelled
+        await asyncio.shield(run_inference_when_ready(repo_id, release_model, repo_id))
+
+
+# Mount static files (built frontend). Registered after every API route, as
+# the catch-all route would otherwise shadow the GET endpoints under /api.
+static_dir = Path("static")
+if static_dir.exists() and static_dir.is_dir():
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+
+    # Serve frontend at root path
+    @app.get("/", include_in_schema=False)
+    async def serve_frontend():
+        return FileResponse("static/index.html")
+
+    # Catch-all route for frontend routing (SPA)
+    @app.get("/{full_path:path}", include_in_schema=False)
+    async def serve_frontend_routes(full_path: str):
+        # If the path starts with /api or /docs, let it pass through to API routes
+        if full_path.startswith(("api/", "docs", "openapi.json")):
+            raise HTTPException(status_code=404, detail="API endpoint not found")
+
+        # For all other paths, serve the frontend
+        file_path = static_dir / full_path
+        if file_path.exists() and file_path.is_file():
+            return FileResponse(file_path)
+        else:
+            # For SPA routing, return index.html
+            return FileResponse("static/index.html")
+
+else:
+
+    @app.get("/", include_in_schema=False)
+    async def root_redirect():
+        return RedirectResponse(url="/docs")
+
+
 if __name__ == "__main__":
     download_espeak_ng_data()
     MyPrint("Starting FastAPI server with Uvicorn...")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Bootstrap of the data directories TTS frontends need besides model files.
+
+espeak-ng-data (phonemizer data for piper, coqui, kokoro and matcha
+models) and the jieba dict (Chinese word segmentation) are unpacked from
+release tarballs into settings.ASSETS_DIR on first use. The tarball is
+taken from settings.ASSET_TARBALLS_DIR when it is there (for hosts without
+network access) and downloaded otherwise.
+
+Several processes may need an asset at the same time, so unpacking is
+serialized with flock on a lock file, and the asset is extracted into a
+temporary directory and renamed into place: the final directory either
+does not exist or is complete.
+"""
+
+import fcntl
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import urllib.request
+from typing import Dict, NamedTuple, Optional
+
+try:
+    from backend import settings
+except ImportError:
+    import settings
+
+
+class Asset(NamedTuple):
+    # Directory name, also the top-level directory in the tarball
+    name: str
+    url: str
+    # File that exists once the asset is completely unpacked
+    marker: str
+
+    @property
+    def tarball(self) -> str:
+        return self.url.rsplit("/", 1)[-1]
+
+
+ESPEAK_NG_DATA = Asset(
+    name="espeak-ng-data",
+    url="https://github.com/k2-fsa/sherpa-onnx/releases/download/tts-models/espeak-ng-data.tar.bz2",
+    marker="phontab",
+)
+JIEBA_DICT = Asset(
+    name="dict",
+    url="https://github.com/csukuangfj/cppjieba/releases/download/sherpa-onnx-2024-04-19/dict.tar.bz2",
+    marker="jieba.dict.utf8",
+)
+
+_ready: Dict[str, str] = {}
+_ready_lock = threading.Lock()
+
+
+def ensure_asset(asset: Asset) -> str:
+    """
+    Return the directory of asset, unpacking it first if needed.
+
+    Raises:
+        RuntimeError: If the asset is missing and cannot be fetched
+    """
+    path = _ready.get(asset.name)
+    if path is not None:
+        return path
+
+    directory = settings.ASSETS_DIR
+    path = os.path.join(directory, asset.name)
+    with _ready_lock:
+        if not os.path.isfile(os.path.join(path, asset.marker)):
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f".{asset.name}.lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    # Another process may have unpacked it while we waited
+                    if not os.path.isfile(os.path.join(path, asset.marker)):
+                        _install(asset, directory, path)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        _ready[asset.name] = path
+    return path
+
+
+def _install(asset: Asset, directory: str, path: str) -> None:
+    # Called with the lock held
+    staging = tempfile.mkdtemp(dir=directory, prefix=f".{asset.name}-")
+    try:
+        tarball = _local_tarball(asset)
+        if tarball is None:
+            tarball = os.path.join(staging, asset.tarball)
+            try:
+                with urllib.request.urlopen(asset.url, timeout=60) as response, open(tarball, "wb") as f:
+                    shutil.copyfileobj(response, f)
+            except OSError as e:
+                raise RuntimeError(
+                    f"Could not download {asset.name} from {asset.url}: {e}. Put "
+                    f"{asset.tarball} in TTS_ASSET_TARBALLS_DIR to install it offline."
+                ) from e
+
+        extracted = os.path.join(staging, "extracted")
+        _extract(tarball, extracted)
+        source = os.path.join(extracted, asset.name)
+        if not os.path.isfile(os.path.join(source, asset.marker)):
+            raise RuntimeError(f"{tarball} has no {asset.name}/{asset.marker}")
+
+        if os.path.lexists(path):
+            # Left incomplete by an older, non-atomic install
+            shutil.rmtree(path, ignore_errors=True)
+        os.rename(source, path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _local_tarball(asset: Asset) -> Optional[str]:
+    if not settings.ASSET_TARBALLS_DIR:
+        return None
+    tarball = os.path.join(settings.ASSET_TARBALLS_DIR, asset.tarball)
+    return tarball if os.path.isfile(tarball) else None
+
+
+def _inside(root: str, path: str) -> bool:
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root + os.sep)
+
+
+def _extract(tarball: str, destination: str) -> None:
+    """Extract tarball, refusing entries that would land outside destination."""
+    root = os.path.realpath(destination)
+    with tarfile.open(tarball) as archive:
+        members = archive.getmembers()
+        for member in members:
+            path = os.path.join(root, member.name)
+            if member.issym():
+                link = os.path.join(os.path.dirname(path), member.linkname)
+            elif member.islnk():
+                link = os.path.join(root, member.linkname)
+            else:
+                link = path
+            if member.isdev() or not _inside(root, path) or not _inside(root, link):
+                raise RuntimeError(f"Unsafe entry in {tarball}: {member.name}")
+        archive.extractall(destination, members=members)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Audio encoding helpers for TTS responses.
+"""
+
+import io
+import struct
+from typing import Dict, Tuple
+
+import numpy as np
+import soundfile as sf
+
+# RIFF and data chunk size used when the length is not known up front, as
+# in a streamed response. Players read until the end of the stream.
+_UNKNOWN_SIZE = 0xFFFFFFFF
+_WAV_HEADER_SIZE = 44
+
+
+def wav_header(
+    sample_rate: int,
+    num_channels: int = 1,
+    bits_per_sample: int = 16,
+    data_size: int = _UNKNOWN_SIZE,
+) -> bytes:
+    """Build a 44-byte PCM WAV header for data_size bytes of audio."""
+    byte_rate = sample_rate * num_channels * bits_per_sample // 8
+    block_align = num_channels * bits_per_sample // 8
+    riff_size = _UNKNOWN_SIZE if data_size == _UNKNOWN_SIZE else 36 + data_size
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        riff_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        num_channels,
+        sample_rate,
+        byte_rate,
+        block_align,
+        bits_per_sample,
+        b"data",
+        data_size,
+    )
+
+
+def _scale_to_pcm16(samples, out: np.ndarray) -> None:
+    # samples is used as-is when it already is a float32 array (sherpa-onnx
+    # returns one), so no per-sample Python objects are created
+    scaled = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+    scaled *= 32767.0
+    out[:] = scaled
+
+
+def float_to_pcm16(samples) -> bytes:
+    """Convert float samples in [-1, 1] to little-endian 16-bit PCM bytes."""
+    samples = np.asarray(samples, dtype=np.float32)
+    pcm = np.empty(samples.size, dtype="<i2")
+    _scale_to_pcm16(samples, pcm)
+    return pcm.tobytes()
+
+
+def encode_wav(samples, sample_rate: int) -> bytes:
+    """
+    Encode float samples as a 16-bit PCM WAV file in memory.
+
+    The header and the samples share one int16 buffer, so the result is
+    built with a single conversion pass and a single copy to bytes.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    header_items = _WAV_HEADER_SIZE // 2
+    buffer = np.empty(header_items + samples.size, dtype="<i2")
+    buffer[:header_items] = np.frombuffer(
+        wav_header(sample_rate, data_size=samples.size * 2), dtype="<i2"
+    )
+    _scale_to_pcm16(samples, buffer[header_items:])
+    return buffer.tobytes()
+
+
+def split_wav(data: bytes) -> Tuple[int, bytes]:
+    """
+    Return (sample_rate, pcm16 bytes) of a WAV file written by encode_wav
+    or wav_header: mono 16-bit PCM with a 44-byte header.
+    """
+    if len(data) < _WAV_HEADER_SIZE or data[:4] != b"RIFF" or data[36:40] != b"data":
+        raise ValueError("Not a 44-byte header PCM WAV file")
+    (sample_rate,) = struct.unpack_from("<I", data, 24)
+    return sample_rate, data[_WAV_HEADER_SIZE:]
+
+
+# output_format -> (media type, file extension, soundfile format, soundfile subtype)
+OUTPUT_FORMATS: Dict[str, Tuple[str, str, str, str]] = {
+    "wav": ("audio/wav", "wav", "WAV", "PCM_16"),
+    "flac": ("audio/flac", "flac", "FLAC", "PCM_16"),
+    "opus": ("audio/ogg", "ogg", "OGG", "OPUS"),
+    "ogg": ("audio/ogg", "ogg", "OGG", "VORBIS"),
+    "mp3": ("audio/mpeg", "mp3", "MP3", "MPEG_LAYER_III"),
+}
+
+# Opus only encodes these sample rates
+_OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def check_output_format(output_format: str) -> None:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unsupported output_format: {output_format}. "
+            f"Choose one of: {', '.join(OUTPUT_FORMATS)}"
+        )
+
+
+def media_type_for(output_format: str) -> Tuple[str, str]:
+    """Return the (media type, file extension) of an output format."""
+    media_type, extension, _, _ = OUTPUT_FORMATS[output_format]
+    return media_type, extension
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """Linear-interpolation resampling, enough for speech going into a lossy codec."""
+    if sample_rate == target_rate or samples.size == 0:
+        return samples
+    duration = samples.size / sample_rate
+    target_times = np.arange(int(round(duration * target_rate))) / target_rate
+    source_times = np.arange(samples.size) / sample_rate
+    return np.interp(target_times, source_times, samples).astype(np.float32)
+
+
+def encoded_sample_rate(output_format: str, sample_rate: int) -> int:
+    """Sample rate audio at sample_rate is encoded at in output_format."""
+    if OUTPUT_FORMATS[output_format][3] == "OPUS" and sample_rate not in _OPUS_SAMPLE_RATES:
+        return next(
+            (rate for rate in _OPUS_SAMPLE_RATES if rate >= sample_rate),
+            _OPUS_SAMPLE_RATES[-1],
+        )
+    return sample_rate
+
+
+def encode_audio(samples, sample_rate: int, output_format: str = "wav") -> bytes:
+    """Encode float samples in memory in one of OUTPUT_FORMATS."""
+    check_output_format(output_format)
+    if output_format == "wav":
+        return encode_wav(samples, sample_rate)
+
+    _, _, file_format, subtype = OUTPUT_FORMATS[output_format]
+    samples = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+    target_rate = encoded_sample_rate(output_format, sample_rate)
+    samples = resample(samples, sample_rate, target_rate)
+    sample_rate = target_rate
+
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format=file_format, subtype=subtype)
+    return buffer.getvalue()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Content-addressed, disk-backed cache of synthesis results.
+
+Entries are stored as one file per key under a shared directory, so several
+uvicorn or inference worker processes can use the same cache. Writes are
+atomic (write to a temporary file, then rename) and the size accounting
+is serialized across processes with flock on a lock file. Least recently
+used entries (by mtime, refreshed on every hit) are evicted once the cache
+grows over its size cap.
+
+Lookups do not take the lock: hit and miss counters are kept in memory by
+each process and added to the shared state every few seconds, and when
+stats() is read.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_STATE_FILE = "state.json"
+_LOCK_FILE = ".lock"
+# Seconds between additions of this process's lookup counters to state.json
+_FLUSH_SECONDS = 5.0
+
+
+class DiskLRUCache:
+    """
+    Size-capped key/value store on disk, safe to share between processes.
+
+    Args:
+        directory: Where entries are stored, created if missing
+        max_bytes: Size cap; the oldest entries are evicted down to 90% of it
+        suffix: File extension of the entries
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        # Lookup counters not yet added to state.json
+        self._counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._evicting = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Return the path of the entry for key, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            # Refresh mtime, which orders entries for eviction
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self._count(misses=1)
+            return None
+        self._count(hits=1, bytes_saved=size)
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another process in between
+            return None
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[str]:
+        """
+        Yield a temporary path to write the entry for key to. It is moved
+        into place when the block exits without an exception.
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=".tmp-", suffix=self.suffix
+        )
+        os.close(fd)
+        try:
+            yield tmp_path
+            size = os.path.getsize(tmp_path)
+            with self._locked_state() as state:
+                try:
+                    state["bytes"] -= os.path.getsize(path)
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp_path, path)
+                state["bytes"] += size
+                over_cap = self.max_bytes and state["bytes"] > self.max_bytes
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        if over_cap:
+            self._evict(int(self.max_bytes * 0.9))
+
+    def put(self, key: str, data: bytes) -> str:
+        with self.writer(key) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        return self.path_for(key)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry, oldest first."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".") or name == _STATE_FILE:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def _evict(self, target_bytes: int) -> None:
+        if not self._evicting.acquire(blocking=False):
+            # Another thread of this process is already evicting
+            return
+        try:
+            # The directory is walked without the lock, which is only held to
+            # remove entries and update the total
+            entries = self._scan()
+            with self._locked_state() as state:
+                for mtime, _, path in entries:
+                    if state["bytes"] <= target_bytes:
+                        break
+                    try:
+                        st = os.stat(path)
+                        if st.st_mtime > mtime:
+                            # Hit since the scan
+                            continue
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                    state["bytes"] = max(0, state["bytes"] - st.st_size)
+                    state["evictions"] += 1
+        finally:
+            self._evicting.release()
+
+    @contextmanager
+    def _locked_state(self, blocking: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the shared state, with the lookup counters of this process
+        added, and write it back. With blocking=False, raises
+        BlockingIOError if another process holds the lock.
+        """
+        state_path = os.path.join(self.directory, _STATE_FILE)
+        with open(os.path.join(self.directory, _LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                state = {"bytes": 0, "hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0}
+                try:
+                    with open(state_path) as f:
+                        state.update(json.load(f))
+                except (FileNotFoundError, ValueError):
+                    pass
+                with self._counts_lock:
+                    counts, self._counts = self._counts, Counter()
+                    self._flushed_at = time.monotonic()
+                for name, value in counts.items():
+                    state[name] += value
+                yield state
+                tmp_path = state_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _count(self, **increments: int) -> None:
+        with self._counts_lock:
+            self._counts.update(increments)
+            due = time.monotonic() - self._flushed_at >= _FLUSH_SECONDS
+        if due:
+            try:
+                with self._locked_state(blocking=False):
+                    pass
+            except BlockingIOError:
+                # Added by the next holder of the lock instead
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked_state() as state:
+            stats = dict(state)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_bytes"] = self.max_bytes
+        stats["directory"] = self.directory
+        return stats
+
+
+def normalize_text(text: str) -> str:
+    """Normalization applied before hashing, so trivially different prompts share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class AudioCache(DiskLRUCache):
+    """Synthesis results keyed by a hash of text, voice and speed."""
+
+    @staticmethod
+    def key(text: str, repo_id: str, sid: Optional[int], speed: float, output_format: str = "wav") -> str:
+        payload = json.dumps(
+            [normalize_text(text), repo_id, sid, round(float(speed), 3), output_format],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
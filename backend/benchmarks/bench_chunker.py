@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark: text chunking for TTS on large inputs, old vs. streaming chunker.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_chunker.py
+    python backend/benchmarks/bench_chunker.py --megabytes 256 --max-length 5000
+    python backend/benchmarks/bench_chunker.py --memory
+
+Compares DocumentProcessor.format_text_for_tts with the implementation it
+replaced (whole-text re.sub, re.split and string concatenation), on Latin
+and Chinese text given all at once, and SentenceBuffer fed in small
+fragments as an LLM or a document stream would. The old SentenceBuffer
+rescans its unfinished sentence on every fragment, which is quadratic on
+text it cannot split (Chinese), so it only gets --old-stream-megabytes.
+--memory also reports peak allocations (tracemalloc makes every run slower).
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_processor import DocumentProcessor, SentenceBuffer  # noqa: E402
+
+_OLD_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def old_format_text_for_tts(text: str, max_length: int = 5000) -> List[str]:
+    text = re.sub(r'\s+', ' ', text)
+    sentences = _OLD_BOUNDARY.split(text)
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) > max_length:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + " "
+        else:
+            current_chunk += sentence + " "
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+class OldSentenceBuffer:
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, fragment: str) -> List[str]:
+        text = re.sub(r'\s+', ' ', self._pending + fragment)
+        parts = _OLD_BOUNDARY.split(text)
+        self._pending = parts[-1]
+        return [part.strip() for part in parts[:-1] if part.strip()]
+
+    def flush(self) -> List[str]:
+        text = self._pending.strip()
+        self._pending = ""
+        return [text] if text else []
+
+
+def make_text(megabytes: float, language: str) -> str:
+    rng = random.Random(0)
+    if language == "zh":
+        words = ["今天", "天气", "很好", "我们", "一起", "去", "公园", "散步", "读书", "学习"]
+        terminators = ["。", "！", "？"]
+        joiner = ""
+    else:
+        words = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "report", "page"]
+        terminators = [".", "!", "?"]
+        joiner = " "
+    sentences = []
+    for _ in range(2000):
+        sentence = joiner.join(rng.choice(words) for _ in range(rng.randint(4, 30)))
+        sentences.append(sentence + rng.choice(terminators) + rng.choice([" ", "  ", "\n", "\n\n"]))
+    block = "".join(sentences)
+    target = int(megabytes * 1024 * 1024)
+    # Sizes are in UTF-8 bytes, so Chinese text has fewer characters
+    repeat = max(1, target // len(block.encode("utf-8")))
+    return block * repeat
+
+
+def chunk_all_at_once(fn: Callable[[str, int], List[str]], text: str, max_length: int) -> int:
+    return len(fn(text, max_length))
+
+
+def feed_in_fragments(buffer, text: str, fragment_size: int) -> int:
+    sentences = 0
+    for start in range(0, len(text), fragment_size):
+        sentences += len(buffer.feed(text[start:start + fragment_size]))
+    return sentences + len(buffer.flush())
+
+
+def measure(label: str, megabytes: float, run: Callable[[], int], memory: bool) -> None:
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - start
+    peak = ""
+    if memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak = f"{peak_bytes / 2**20:10.1f}"
+    print(f"{label:<36} {megabytes:8.1f} {elapsed:9.2f} {megabytes / elapsed:9.1f} {count:>9} {peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--megabytes", type=float, default=128.0)
+    parser.add_argument("--max-length", type=int, default=5000)
+    parser.add_argument("--fragment-size", type=int, default=4096)
+    parser.add_argument("--old-stream-megabytes", type=float, default=2.0)
+    parser.add_argument("--memory", action="store_true", help="Also report peak allocations")
+    args = parser.parse_args()
+
+    print(f"{'case':<36} {'MB':>8} {'seconds':>9} {'MB/s':>9} {'items':>9} {'peak MB' if args.memory else ''}")
+    for language in ("en", "zh"):
+        text = make_text(args.megabytes, language)
+        megabytes = len(text.encode("utf-8")) / 2**20
+        for name, fn in (("old", old_format_text_for_tts), ("new", DocumentProcessor.format_text_for_tts)):
+            measure(
+                f"format_text_for_tts {name} {language}",
+                megabytes,
+                lambda: chunk_all_at_once(fn, text, args.max_length),
+                args.memory,
+            )
+        measure(
+            f"SentenceBuffer new {language}",
+            megabytes,
+            lambda: feed_in_fragments(SentenceBuffer(), text, args.fragment_size),
+            args.memory,
+        )
+        small = text[: int(args.old_stream_megabytes * 2**20 / len(text.encode("utf-8")) * len(text))]
+        small_megabytes = len(small.encode("utf-8")) / 2**20
+        measure(
+            f"SentenceBuffer old {language}",
+            small_megabytes,
+            lambda: feed_in_fragments(OldSentenceBuffer(), small, args.fragment_size),
+            args.memory,
+        )
+        del text
+
+
+if __name__ == "__main__":
+    main()
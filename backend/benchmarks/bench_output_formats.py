@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encode cost vs. bytes saved for each TTS output format.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_output_formats.py
+    python backend/benchmarks/bench_output_formats.py --seconds 120 --sample-rate 24000
+    python backend/benchmarks/bench_output_formats.py --repo-id "csukuangfj/vits-piper-en_US-lessac-medium|1 speaker"
+
+Without --repo-id a synthetic speech-like signal is used, so the benchmark
+runs without downloading a model.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio import OUTPUT_FORMATS, encode_audio  # noqa: E402
+
+
+def synthetic_speech(seconds: float, sample_rate: int) -> np.ndarray:
+    """Voiced segments with a moving pitch, separated by short pauses."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = (np.sin(2 * np.pi * 2.5 * t) > -0.3).astype(np.float32)
+    noise = 0.02 * rng.standard_normal(t.size)
+    return (0.3 * voiced * envelope + noise).astype(np.float32)
+
+
+def synthesize(repo_id: str, text: str) -> tuple:
+    from model import get_pretrained_model
+
+    tts = get_pretrained_model(repo_id)
+    audio = tts.generate(text, sid=0, speed=1.0)
+    return np.asarray(audio.samples, dtype=np.float32), tts.sample_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--sample-rate", type=int, default=22050)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--repo-id", help="Synthesize with this model instead of a synthetic signal")
+    parser.add_argument(
+        "--text",
+        default="The quick brown fox jumps over the lazy dog. " * 20,
+        help="Text to synthesize with --repo-id",
+    )
+    args = parser.parse_args()
+
+    if args.repo_id:
+        samples, sample_rate = synthesize(args.repo_id, args.text)
+    else:
+        samples, sample_rate = synthetic_speech(args.seconds, args.sample_rate), args.sample_rate
+    duration = samples.size / sample_rate
+
+    print(f"Audio: {duration:.1f} s at {sample_rate} Hz, best of {args.repeat} runs")
+    print(f"{'format':<8}{'bytes':>12}{'vs wav':>10}{'kbit/s':>10}{'encode ms':>12}{'x realtime':>12}")
+
+    wav_bytes = None
+    for output_format in OUTPUT_FORMATS:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            encoded = encode_audio(samples, sample_rate, output_format)
+            best = min(best, time.perf_counter() - start)
+        size = len(encoded)
+        if wav_bytes is None:
+            wav_bytes = size
+        print(
+            f"{output_format:<8}{size:>12}{size / wav_bytes:>10.3f}"
+            f"{size * 8 / duration / 1000:>10.1f}{best * 1000:>12.1f}{duration / best:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
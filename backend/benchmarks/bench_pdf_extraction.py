@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serial vs. process-pool PDF text extraction by page count.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_pdf_extraction.py
+    python backend/benchmarks/bench_pdf_extraction.py --pages 50 200 500 --workers 2 4 8
+    python backend/benchmarks/bench_pdf_extraction.py --pdf book.pdf --workers 4
+
+Without --pdf, text-only PDFs of the requested page counts are generated,
+so the benchmark needs no sample documents. Run it on a machine with as
+many cores as the largest worker count: the worker count is capped by the
+cores, and with a single core every run extracts serially.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import document_processor  # noqa: E402
+import settings  # noqa: E402
+from document_processor import DocumentProcessor, shutdown_pdf_workers  # noqa: E402
+
+_LINE = "The quick brown fox jumps over the lazy dog while the committee reviews page {page}."
+
+
+def make_pdf(num_pages: int, lines_per_page: int = 45) -> bytes:
+    """A minimal text-only PDF with num_pages pages of Helvetica text."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(num_pages):
+        lines = [
+            f"({_LINE.format(page=page + 1)} {line}) Tj T*" for line in range(lines_per_page)
+        ]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def extract(content: bytes, workers: int) -> float:
+    settings.PDF_WORKERS = workers
+    settings.PDF_PARALLEL_MIN_PAGES = 1
+    start = time.perf_counter()
+    text = DocumentProcessor.process_document(content, "bench.pdf")
+    elapsed = time.perf_counter() - start
+    if not text:
+        raise RuntimeError("No text extracted")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[25, 100, 400])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--pdf", help="Benchmark this PDF instead of generated ones")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            documents = [(f.read(), args.pdf)]
+    else:
+        documents = [(make_pdf(pages), f"{pages} pages") for pages in args.pages]
+
+    print(f"{'document':>16} {'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for content, label in documents:
+        serial = extract(content, 0)
+        print(f"{label:>16} {'serial':>8} {serial:9.2f} {1.0:8.2f}")
+        for workers in args.workers:
+            # Start the pool outside the measurement, as a running server would have it
+            shutdown_pdf_workers()
+            settings.PDF_WORKERS = workers
+            document_processor._get_pdf_pool().submit(int).result()
+            elapsed = extract(content, workers)
+            print(f"{label:>16} {workers:>8} {elapsed:9.2f} {serial / elapsed:8.2f}")
+    shutdown_pdf_workers()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Estimated synthesis cost of text, per model.
+
+Text is measured in cost units: one unit per character, with CJK characters
+weighted by how much more speech each one carries. Every model starts from
+a prior real-time factor (RTF, synthesis seconds per second of audio) for
+its family in the model registry, and the seconds it takes per unit are then calibrated from
+measured synthesis times with an exponentially weighted moving average.
+
+Document jobs with chunking=cost turn their target seconds per chunk into
+a budget of cost units with seconds_per_unit, and cut chunks by text_cost,
+so the chunks fanned out across workers take roughly equal synthesis time
+and finish together instead of waiting on one straggler.
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict
+
+# Seconds of speech per cost unit at speed 1.0 (about 14 Latin characters a second)
+AUDIO_SECONDS_PER_UNIT = 1 / 14
+# A CJK character (Han, kana, hangul) is read in about as long as three Latin ones
+CJK_WEIGHT = 3.0
+
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+# Prior RTF by model family (see ModelDescriptor.family), and quality for
+# piper, on one CPU thread. Rough figures, only used until a model has been
+# measured.
+FAMILY_RTF = {
+    "kokoro": 0.5,
+    "melo": 0.3,
+    "matcha": 0.12,
+    "piper-x_low": 0.03,
+    "piper-low": 0.05,
+    "piper-medium": 0.1,
+    "piper-high": 0.25,
+    "coqui": 0.15,
+    "mms": 0.15,
+    "mimic3": 0.1,
+    "vits": 0.15,
+}
+_DEFAULT_RTF = FAMILY_RTF["vits"]
+
+
+def prior_family(descriptor: Any) -> str:
+    """Key of FAMILY_RTF for a model descriptor."""
+    if descriptor.family == "piper":
+        return f"piper-{descriptor.quality or 'medium'}"
+    return descriptor.family
+
+
+def text_cost(text: str) -> float:
+    """Size of text in cost units."""
+    return len(text) + (CJK_WEIGHT - 1) * len(_CJK.findall(text))
+
+
+class CostModel:
+    """
+    Per-model synthesis seconds per cost unit, calibrated as models are used.
+
+    Args:
+        describe: Returns the registry descriptor of a repo_id
+            (model.get_model_descriptor)
+        alpha: Weight of a new measurement in the moving average
+        min_units: Measurements of shorter texts are ignored, as fixed
+            per-call overhead dominates them
+    """
+
+    def __init__(
+        self,
+        describe: Callable[[str], Any],
+        alpha: float = 0.2,
+        min_units: float = 20.0,
+    ):
+        self._describe = describe
+        self._alpha = alpha
+        self._min_units = min_units
+        self._lock = threading.Lock()
+        # repo_id -> [seconds per unit, samples, last RTF]
+        self._calibrated: Dict[str, list] = {}
+
+    def family(self, repo_id: str) -> str:
+        return prior_family(self._describe(repo_id))
+
+    def prior_seconds_per_unit(self, repo_id: str) -> float:
+        return FAMILY_RTF.get(self.family(repo_id), _DEFAULT_RTF) * AUDIO_SECONDS_PER_UNIT
+
+    def seconds_per_unit(self, repo_id: str) -> float:
+        """Synthesis seconds per cost unit at speed 1.0."""
+        with self._lock:
+            calibrated = self._calibrated.get(repo_id)
+        if calibrated is None:
+            return self.prior_seconds_per_unit(repo_id)
+        return calibrated[0]
+
+    def observe(
+        self, repo_id: str, text: str, speed: float, seconds: float, audio_seconds: float
+    ) -> None:
+        """Record that synthesizing text took seconds and produced audio_seconds of audio."""
+        units = text_cost(text)
+        if units < self._min_units or seconds <= 0:
+            return
+        rate = seconds * speed / units
+        rtf = seconds / audio_seconds if audio_seconds > 0 else 0.0
+        with self._lock:
+            calibrated = self._calibrated.get(repo_id)
+            if calibrated is None:
+                # Start from the measurement rather than the prior
+                self._calibrated[repo_id] = [rate, 1, rtf]
+            else:
+                calibrated[0] += self._alpha * (rate - calibrated[0])
+                calibrated[1] += 1
+                calibrated[2] = rtf
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calibrated = {key: list(value) for key, value in self._calibrated.items()}
+        return {
+            "audio_seconds_per_unit": AUDIO_SECONDS_PER_UNIT,
+            "cjk_weight": CJK_WEIGHT,
+            "models": [
+                {
+                    "repo_id": repo_id,
+                    "family": self.family(repo_id),
+                    "prior_seconds_per_unit": self.prior_seconds_per_unit(repo_id),
+                    "seconds_per_unit": seconds_per_unit,
+                    "samples": samples,
+                    "last_rtf": rtf,
+                }
+                for repo_id, (seconds_per_unit, samples, rtf) in sorted(calibrated.items())
+            ],
+        }
@@ -7,26 +7,285 @@ Handles conversion of various document formats to formatted text.
 import os
 import re
 import io
-from typing import Dict, Any, Optional, List, Tuple
+import codecs
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, BinaryIO, Callable, Iterator, Optional, List, Tuple, Union
 
 # Document processing libraries
 import docx
 import PyPDF2
 from pptx import Presentation
 
+try:
+    from backend import settings
+except ImportError:
+    import settings
+
+# End of a sentence for TTS: a terminator and the whitespace after it. That
+# is . ! or ? followed by whitespace, or a CJK 。！？, which needs no space
+# after it but is not cut from a following terminator or closing quote or
+# bracket. The terminator comes first so the regex engine can skip ahead
+# to candidate characters.
+SENTENCE_END = re.compile(r'[.!?。！？](?:(?<=[.!?])\s+|(?<=[。！？])(?![。！？」』）”])\s*)')
+_LATIN_TERMINATORS = '.!?'
+_CJK_TERMINATORS = '。！？'
+# Whitespace that is not already a single space; most sentences have none,
+# and sub() then returns them without a copy
+_WHITESPACE = re.compile(r'\s{2,}|[^\S ]')
+
+
+# Process pool for PDF text extraction, started on first use
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _pdf_worker_count() -> int:
+    """Processes that extract one PDF: settings.PDF_WORKERS, at most one per core."""
+    return min(settings.PDF_WORKERS, os.cpu_count() or 1)
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, _pdf_worker_count()),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_workers() -> None:
+    """Stop the PDF extraction processes, if they were started."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+# Version of the text the extractors produce. Bump it whenever a change to
+# them alters their output, so cached extractions are not reused.
+EXTRACTOR_VERSION = 1
+
+# Bytes read at a time from plain text files
+_TXT_BLOCK_SIZE = 1024 * 1024
+
+# What the extractors accept: the content of a file, or a seekable binary file
+DocumentSource = Union[bytes, BinaryIO]
+
+
+def _as_stream(source: DocumentSource) -> BinaryIO:
+    # BytesIO shares the buffer of the bytes object it wraps until written to
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+@contextmanager
+def _on_disk(source: DocumentSource, suffix: str) -> Iterator[str]:
+    """Yield a path to the content of source, copying it to a temporary file if needed."""
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+    with tempfile.NamedTemporaryFile(suffix=suffix) as copy:
+        if isinstance(source, (bytes, bytearray)):
+            copy.write(source)
+        else:
+            source.seek(0)
+            shutil.copyfileobj(source, copy)
+        copy.flush()
+        yield copy.name
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Runs in the PDF process pool: the raw text of pages [start, stop)."""
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, with whitespace runs collapsed."""
+    buffer = SentenceBuffer()
+    sentences = buffer.feed(text)
+    sentences.extend(buffer.flush())
+    return sentences
+
+
+class SentenceBuffer:
+    """
+    Accumulates text fragments (e.g. tokens streamed from an LLM) and
+    releases complete sentences as soon as their boundary is seen, using the
+    same rules as DocumentProcessor.format_text_for_tts.
+    
+    Each fragment is scanned once, whatever the size of the unfinished
+    sentence before it, so feeding a document in any number of pieces is
+    linear in its length.
+    """
+    
+    def __init__(self):
+        # Unfinished sentence, whitespace already collapsed
+        self._parts: List[str] = []
+        # Last character fed, to find a boundary right at a fragment start
+        self._last = ""
+        # CJK terminators ending the last fragment: whether they end the
+        # sentence depends on what follows, so they wait for the next one
+        self._held = ""
+    
+    def feed(self, fragment: str) -> List[str]:
+        """
+        Add a fragment and return the sentences it completed.
+        
+        A sentence is complete once its terminator is followed by whitespace
+        or, for a CJK terminator, by anything but another terminator or a
+        closing quote or bracket. The text after the last boundary stays
+        buffered, and so does a CJK terminator ending the fragment.
+        """
+        return list(self.iter_feed(fragment))
+    
+    def iter_feed(self, fragment: str) -> Iterator[str]:
+        """Like feed, but yields the sentences as they are found."""
+        if not fragment:
+            return
+        if self._held:
+            fragment = self._held + fragment
+            self._held = ""
+        if self._last and self._last in _LATIN_TERMINATORS and fragment[0].isspace():
+            yield from self._end_sentence()
+        
+        cut = len(fragment.rstrip(_CJK_TERMINATORS))
+        if cut < len(fragment):
+            self._held = fragment[cut:]
+            fragment = fragment[:cut]
+            if not fragment:
+                return
+        
+        start = 0
+        for end in SENTENCE_END.finditer(fragment):
+            # Keep the terminator, drop the whitespace after it
+            stop = end.start() + 1
+            if self._parts:
+                self._append(fragment[start:stop])
+                yield from self._end_sentence()
+            else:
+                # Common case: the whole sentence is in this fragment
+                sentence = _WHITESPACE.sub(' ', fragment[start:stop]).strip()
+                if sentence:
+                    yield sentence
+            start = end.end()
+        self._append(fragment[start:])
+        self._last = fragment[-1]
+    
+    def flush(self) -> List[str]:
+        """Return whatever is buffered as a final sentence."""
+        self._append(self._held)
+        self._held = ""
+        self._last = ""
+        return list(self._end_sentence())
+    
+    def _append(self, piece: str) -> None:
+        if not piece:
+            return
+        piece = _WHITESPACE.sub(' ', piece)
+        # A whitespace run split across two fragments
+        if piece[0] == ' ' and self._parts and self._parts[-1][-1] == ' ':
+            piece = piece[1:]
+        if piece:
+            self._parts.append(piece)
+    
+    def _end_sentence(self) -> Iterator[str]:
+        sentence = "".join(self._parts).strip()
+        self._parts = []
+        if sentence:
+            yield sentence
+
+
+class TextChunker:
+    """
+    Packs the sentences of a stream of text into chunks of at most
+    max_length characters (a sentence longer than that is a chunk of its
+    own), releasing each chunk as soon as the next one starts.
+    
+    Only the current chunk and the unfinished sentence are kept in memory,
+    and each piece of text is copied a bounded number of times, so chunking
+    is linear in the size of the input.
+    
+    Args:
+        max_length: Maximum size of a chunk
+        cost: Size of a piece of text in the unit of max_length, e.g. its
+            estimated synthesis time; defaults to its length in characters
+    """
+    
+    def __init__(self, max_length: float = 5000, cost: Optional[Callable[[str], float]] = None):
+        self.max_length = max_length
+        self._cost = cost or len
+        # Sentences in a chunk are joined with a space
+        self._separator_cost = self._cost(" ")
+        self._sentences = SentenceBuffer()
+        self._current: List[str] = []
+        self._current_length = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the chunks it completed."""
+        return list(self.iter_feed(text))
+    
+    def iter_feed(self, text: str) -> Iterator[str]:
+        """Like feed, but yields the chunks as they are completed."""
+        for sentence in self._sentences.iter_feed(text):
+            chunk = self._pack(sentence)
+            if chunk is not None:
+                yield chunk
+    
+    def flush(self) -> List[str]:
+        """Return the remaining text as the last chunk(s)."""
+        chunks = [self._pack(sentence) for sentence in self._sentences.flush()]
+        if self._current:
+            chunks.append(" ".join(self._current))
+            self._current = []
+            self._current_length = 0
+        return [chunk for chunk in chunks if chunk is not None]
+    
+    def _pack(self, sentence: str) -> Optional[str]:
+        """Add a sentence, returning the chunk it closed, if any."""
+        chunk = None
+        size = self._cost(sentence)
+        # Every sentence is counted with the space that follows it
+        if self._current_length + size > self.max_length and self._current:
+            chunk = " ".join(self._current)
+            self._current = []
+            self._current_length = 0
+        self._current.append(sentence)
+        self._current_length += size + self._separator_cost
+        return chunk
+
+
 class DocumentProcessor:
     """
     Processes various document formats and extracts formatted text for TTS.
     Supported formats: PDF, DOCX, PPTX, TXT
     """
     
+    SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.pptx', '.txt')
+    
+    # What process_document puts between the pieces iter_document yields
+    PART_SEPARATORS = {'.pdf': '\n', '.docx': '\n\n', '.pptx': '\n\n', '.txt': ''}
+    
     @staticmethod
-    def process_document(file_content: bytes, filename: str) -> str:
+    def process_document(source: DocumentSource, filename: str) -> str:
         """
         Process a document file and extract formatted text.
         
         Args:
-            file_content: The binary content of the file
+            source: The binary content of the file, or a seekable binary
+                file object (e.g. a spooled upload), read without loading
+                it into memory at once
             filename: Original filename with extension
             
         Returns:
@@ -38,51 +297,131 @@ class DocumentProcessor:
         file_ext = os.path.splitext(filename)[1].lower()
         
         if file_ext == '.pdf':
-            return DocumentProcessor._process_pdf(file_content)
+            return DocumentProcessor._process_pdf(source)
+        elif file_ext == '.docx':
+            return DocumentProcessor._process_docx(source)
+        elif file_ext == '.pptx':
+            return DocumentProcessor._process_pptx(source)
+        elif file_ext == '.txt':
+            return DocumentProcessor._process_txt(source)
+        else:
+            raise ValueError(f"Unsupported file format: {file_ext}")
+    
+    @staticmethod
+    def iter_document(source: DocumentSource, filename: str) -> Iterator[str]:
+        """
+        Extract the text of a document piece by piece, as it is parsed.
+        
+        Yields one piece per page (PDF), paragraph or table (DOCX), slide
+        (PPTX), formatted like process_document, or blocks of decoded text
+        cut at whitespace (TXT). Pieces never split a word, so they can be
+        fed to a TextChunker with whitespace in between.
+        
+        Args:
+            source: The binary content of the file, or a seekable binary
+                file object, which must stay open while iterating
+            filename: Original filename with extension
+            
+        Raises:
+            ValueError: If file format is not supported or processing fails
+        """
+        file_ext = os.path.splitext(filename)[1].lower()
+        
+        if file_ext == '.pdf':
+            return DocumentProcessor._iter_pdf(source)
         elif file_ext == '.docx':
-            return DocumentProcessor._process_docx(file_content)
+            return DocumentProcessor._iter_docx(source)
         elif file_ext == '.pptx':
-            return DocumentProcessor._process_pptx(file_content)
+            return DocumentProcessor._iter_pptx(source)
         elif file_ext == '.txt':
-            return DocumentProcessor._process_txt(file_content)
+            return DocumentProcessor._iter_txt(source)
         else:
             raise ValueError(f"Unsupported file format: {file_ext}")
     
     @staticmethod
-    def _process_pdf(file_content: bytes) -> str:
+    def _process_pdf(source: DocumentSource) -> str:
         """Extract and format text from PDF files."""
+        separator = DocumentProcessor.PART_SEPARATORS['.pdf']
+        return separator.join(DocumentProcessor._iter_pdf(source))
+    
+    @staticmethod
+    def _iter_pdf(source: DocumentSource) -> Iterator[str]:
+        """
+        Yield the formatted text of each PDF page that has any.
+        
+        Documents with at least settings.PDF_PARALLEL_MIN_PAGES pages are
+        extracted by settings.PDF_WORKERS processes when that is above 1,
+        capped by the number of cores; with a single core they never are.
+        """
         try:
-            pdf_file = io.BytesIO(file_content)
+            pdf_file = _as_stream(source)
             reader = PyPDF2.PdfReader(pdf_file)
+            num_pages = len(reader.pages)
+            workers = _pdf_worker_count()
             
-            text_parts = []
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text_parts.append(f"Página {i+1}.\n{page_text.strip()}\n")
+            if workers > 1 and num_pages >= settings.PDF_PARALLEL_MIN_PAGES:
+                page_texts = DocumentProcessor._iter_pdf_pages_parallel(source, num_pages, workers)
+            else:
+                page_texts = (page.extract_text() for page in reader.pages)
             
-            return "\n".join(text_parts)
+            for i, page_text in enumerate(page_texts):
+                if page_text.strip():
+                    yield f"Página {i+1}.\n{page_text.strip()}\n"
         except Exception as e:
             raise ValueError(f"Failed to process PDF: {str(e)}")
     
     @staticmethod
-    def _process_docx(file_content: bytes) -> str:
+    def _iter_pdf_pages_parallel(
+        source: DocumentSource, num_pages: int, workers: int
+    ) -> Iterator[str]:
+        """
+        Yield the raw text of every page in order, extracted by the process pool.
+        
+        Each worker gets one contiguous page range, so the PDF is parsed
+        once per worker rather than once per batch. The workers open it by
+        path (a temporary copy unless source is a file on disk) instead of
+        receiving a copy of it.
+        """
+        with _on_disk(source, ".pdf") as path:
+            pool = _get_pdf_pool()
+            futures = [
+                pool.submit(
+                    _extract_pdf_pages,
+                    path,
+                    worker * num_pages // workers,
+                    (worker + 1) * num_pages // workers,
+                )
+                for worker in range(workers)
+            ]
+            try:
+                for future in futures:
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+    
+    @staticmethod
+    def _process_docx(source: DocumentSource) -> str:
         """Extract and format text from DOCX files."""
+        separator = DocumentProcessor.PART_SEPARATORS['.docx']
+        return separator.join(DocumentProcessor._iter_docx(source))
+    
+    @staticmethod
+    def _iter_docx(source: DocumentSource) -> Iterator[str]:
+        """Yield each DOCX paragraph, then each table, as formatted text."""
         try:
-            docx_file = io.BytesIO(file_content)
+            docx_file = _as_stream(source)
             doc = docx.Document(docx_file)
             
-            text_parts = []
-            
             # Process paragraphs with formatting awareness
             for para in doc.paragraphs:
                 if para.text.strip():
                     # Check if paragraph is a heading
                     if para.style.name.startswith('Heading'):
                         heading_level = int(para.style.name.replace('Heading', '')) if para.style.name != 'Heading' else 1
-                        text_parts.append(f"{'#' * heading_level} {para.text.strip()}")
+                        yield f"{'#' * heading_level} {para.text.strip()}"
                     else:
-                        text_parts.append(para.text.strip())
+                        yield para.text.strip()
             
             # Process tables
             for table in doc.tables:
@@ -92,21 +431,23 @@ class DocumentProcessor:
                     table_text.append(" | ".join(row_text))
                 
                 if table_text:
-                    text_parts.append("Tabela:\n" + "\n".join(table_text))
-            
-            return "\n\n".join(text_parts)
+                    yield "Tabela:\n" + "\n".join(table_text)
         except Exception as e:
             raise ValueError(f"Failed to process DOCX: {str(e)}")
     
     @staticmethod
-    def _process_pptx(file_content: bytes) -> str:
+    def _process_pptx(source: DocumentSource) -> str:
         """Extract and format text from PPTX files."""
+        separator = DocumentProcessor.PART_SEPARATORS['.pptx']
+        return separator.join(DocumentProcessor._iter_pptx(source))
+    
+    @staticmethod
+    def _iter_pptx(source: DocumentSource) -> Iterator[str]:
+        """Yield the formatted text of each PPTX slide that has any."""
         try:
-            pptx_file = io.BytesIO(file_content)
+            pptx_file = _as_stream(source)
             presentation = Presentation(pptx_file)
             
-            text_parts = []
-            
             for i, slide in enumerate(presentation.slides):
                 slide_text = []
                 slide_text.append(f"Slide {i+1}.")
@@ -117,35 +458,65 @@ class DocumentProcessor:
                         slide_text.append(shape.text.strip())
                 
                 if len(slide_text) > 1:  # If we have more than just the slide number
-                    text_parts.append("\n".join(slide_text))
-            
-            return "\n\n".join(text_parts)
+                    yield "\n".join(slide_text)
         except Exception as e:
             raise ValueError(f"Failed to process PPTX: {str(e)}")
     
     @staticmethod
-    def _process_txt(file_content: bytes) -> str:
+    def _process_txt(source: DocumentSource) -> str:
         """Process plain text files."""
+        return DocumentProcessor.normalize_txt("".join(DocumentProcessor._iter_txt(source)))
+    
+    @staticmethod
+    def normalize_txt(text: str) -> str:
+        """Clean up the decoded text of a plain text file."""
+        text = re.sub(r'\r\n', '\n', text)  # Normalize line endings
+        text = re.sub(r'\n{3,}', '\n\n', text)  # Remove excessive line breaks
+        
+        return text
+    
+    @staticmethod
+    def _iter_txt(source: DocumentSource) -> Iterator[str]:
+        """
+        Yield the decoded text of a plain text file in blocks that end
+        after a whitespace character (except the last).
+        """
         try:
-            # Try different encodings
+            stream = _as_stream(source)
+            
+            # Try different encodings, checking the whole file before the
+            # first block is released
             encodings = ['utf-8', 'latin-1', 'cp1252']
-            text = None
+            encoding = None
             
-            for encoding in encodings:
+            for candidate in encodings:
+                stream.seek(0)
+                decoder = codecs.getincrementaldecoder(candidate)()
                 try:
-                    text = file_content.decode(encoding)
-                    break
+                    for block in iter(lambda: stream.read(_TXT_BLOCK_SIZE), b''):
+                        decoder.decode(block)
+                    decoder.decode(b'', final=True)
                 except UnicodeDecodeError:
                     continue
+                encoding = candidate
+                break
             
-            if text is None:
+            if encoding is None:
                 raise ValueError("Could not decode text file with any of the attempted encodings")
-                
-            # Clean up the text
-            text = re.sub(r'\r\n', '\n', text)  # Normalize line endings
-            text = re.sub(r'\n{3,}', '\n\n', text)  # Remove excessive line breaks
             
-            return text
+            stream.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)()
+            carry = ""
+            for block in iter(lambda: stream.read(_TXT_BLOCK_SIZE), b''):
+                text = carry + decoder.decode(block)
+                # Cut after the last whitespace, so no piece ends mid-word
+                cut = max(text.rfind("\n"), text.rfind(" ")) + 1 or len(text)
+                carry = text[cut:]
+                if cut:
+                    yield text[:cut]
+            text = carry + decoder.decode(b'', final=True)
+            if text:
+                yield text
         except Exception as e:
             raise ValueError(f"Failed to process TXT: {str(e)}")
     
@@ -154,6 +525,9 @@ class DocumentProcessor:
         """
         Format and split text into chunks suitable for TTS processing.
         
+        Whitespace runs become single spaces and the text is cut at sentence
+        boundaries (see SENTENCE_END) into chunks of whole sentences.
+        
         Args:
             text: The input text to format
             max_length: Maximum length of each chunk
@@ -161,27 +535,7 @@ class DocumentProcessor:
         Returns:
             List of text chunks ready for TTS
         """
-        # Clean up text
-        text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with single space
-        
-        # Split by sentences to avoid cutting in the middle of a sentence
-        sentence_pattern = r'(?<=[.!?])\s+'
-        sentences = re.split(sentence_pattern, text)
-        
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            # If adding this sentence would exceed max_length, start a new chunk
-            if len(current_chunk) + len(sentence) > max_length:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
-            else:
-                current_chunk += sentence + " "
-        
-        # Add the last chunk if not empty
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
+        chunker = TextChunker(max_length)
+        chunks = chunker.feed(text)
+        chunks.extend(chunker.flush())
         return chunks
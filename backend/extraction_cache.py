@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Disk-backed cache of text extracted from documents.
+
+Entries are keyed by a hash of the file content, its format and
+EXTRACTOR_VERSION, so a document uploaded again (to try another voice or
+chunk length) is not parsed again, whatever its filename. An entry holds
+the pieces DocumentProcessor.iter_document yields, joined the way
+process_document joins them, as UTF-8 text.
+"""
+
+import hashlib
+import os
+from typing import Iterator
+
+try:
+    from backend.audio_cache import DiskLRUCache
+    from backend.document_processor import (
+        EXTRACTOR_VERSION,
+        DocumentProcessor,
+        DocumentSource,
+    )
+except ImportError:
+    from audio_cache import DiskLRUCache
+    from document_processor import EXTRACTOR_VERSION, DocumentProcessor, DocumentSource
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ExtractionCache(DiskLRUCache):
+    """
+    Extracted document text keyed by content hash, format and extractor version.
+
+    Args:
+        directory: Where entries are stored, created if missing
+        max_bytes: Size cap; the oldest entries are evicted down to 90% of it
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        super().__init__(directory, max_bytes, suffix=".txt")
+
+    @staticmethod
+    def key(source: DocumentSource, filename: str) -> str:
+        """Hash of the content of source, read in blocks if it is a file."""
+        digest = hashlib.sha256()
+        if isinstance(source, (bytes, bytearray)):
+            digest.update(source)
+        else:
+            source.seek(0)
+            for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+            source.seek(0)
+        file_ext = os.path.splitext(filename)[1].lower()
+        digest.update(f"\0{file_ext}\0{EXTRACTOR_VERSION}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def process_document(self, source: DocumentSource, filename: str) -> str:
+        """DocumentProcessor.process_document, served from the cache when possible."""
+        key = self.key(source, filename)
+        data = self.get(key)
+        if data is None:
+            text = DocumentProcessor.process_document(source, filename)
+            self.put(key, text.encode("utf-8"))
+            return text
+        text = data.decode("utf-8")
+        if filename.lower().endswith(".txt"):
+            # Entries written by iter_document hold the text before clean-up
+            text = DocumentProcessor.normalize_txt(text)
+        return text
+
+    def iter_document(self, source: DocumentSource, filename: str) -> Iterator[str]:
+        """
+        DocumentProcessor.iter_document, served from the cache when possible.
+
+        A hit yields the cached text in blocks cut at whitespace. On a miss
+        the pieces are written to the entry as they are extracted, and the
+        entry is only stored if the iteration runs to the end.
+        """
+        key = self.key(source, filename)
+        path = self.get_path(key)
+        if path is not None:
+            try:
+                cached = open(path, "rb")
+            except FileNotFoundError:
+                # Evicted by another process in between
+                cached = None
+            if cached is not None:
+                with cached:
+                    yield from DocumentProcessor._iter_txt(cached)
+                return
+
+        file_ext = os.path.splitext(filename)[1].lower()
+        separator = DocumentProcessor.PART_SEPARATORS.get(file_ext, "")
+        parts = DocumentProcessor.iter_document(source, filename)
+        with self.writer(key) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for i, part in enumerate(parts):
+                    if i:
+                        out.write(separator)
+                    out.write(part)
+                    yield part
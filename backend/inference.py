@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Bounded executor for blocking TTS work.
+
+Synthesis, model loading and audio encoding are CPU-bound and block the
+calling thread. Running them here keeps the uvicorn event loop free for
+I/O-bound endpoints (language lists, static files, health checks).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the executor already has max_queue jobs waiting."""
+
+
+class InferenceExecutor:
+    """
+    Thread pool with in-flight and queued counters.
+
+    Args:
+        max_workers: Number of jobs that run at the same time
+        max_queue: Maximum number of jobs waiting for a worker, 0 = unlimited
+    """
+
+    def __init__(self, max_workers: int, max_queue: int = 0):
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts-inference"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self._max_queue and self._queued >= self._max_queue:
+                self._rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._queued} jobs waiting), try again later."
+                )
+            self._queued += 1
+
+        future = self._executor.submit(self._call, fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on the executor and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _call(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            if future.cancelled():
+                # Cancelled before a worker picked it up, _call never ran
+                self._queued -= 1
+            elif future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self._max_workers,
+                "max_queue": self._max_queue,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
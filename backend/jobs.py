@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Asynchronous whole-document synthesis jobs.
+
+A job turns an uploaded document into one audio file on the server: the
+text is extracted and chunked page by page, chunks are synthesized in
+parallel while the rest of the document is still being parsed, and the
+result is encoded once every chunk is done.
+
+Each job lives in its own directory:
+
+    <jobs dir>/<job id>/job.json        parameters, status and progress
+    <jobs dir>/<job id>/source.<ext>    the uploaded document
+    <jobs dir>/<job id>/chunks.jsonl    text chunks, appended as they are cut
+    <jobs dir>/<job id>/chunk-N.pcm     16-bit PCM of chunk N, once synthesized
+    <jobs dir>/<job id>/audio.<ext>     the finished audio
+
+Chunk files are written atomically, so they double as the checkpoint: a
+job interrupted by a restart is resumed on startup and only synthesizes
+the chunks that have no file yet. The state of a running job is kept in
+memory and job.json is rewritten from it in a thread, with the progress
+updates made during a write saved together by the next one. Finished and
+failed jobs are removed once they are older than the retention period.
+
+Chunks are synthesized sentence by sentence. Every sentence is looked up
+in the synthesis result cache first, and identical sentences in flight at
+the same time are synthesized once, so the headers, footers and other
+boilerplate repeated through a document are only paid for once. sherpa-onnx
+synthesizes sentence by sentence anyway, so the spliced audio matches what
+a single generate() call on the chunk would produce.
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import soundfile as sf
+
+try:
+    from backend.audio import (
+        OUTPUT_FORMATS,
+        encoded_sample_rate,
+        resample,
+        split_wav,
+        wav_header,
+    )
+    from backend.audio_cache import AudioCache, DiskLRUCache
+    from backend.cost_model import text_cost
+    from backend.document_processor import DocumentProcessor, TextChunker, split_sentences
+    from backend.extraction_cache import ExtractionCache
+except ImportError:
+    from audio import OUTPUT_FORMATS, encoded_sample_rate, resample, split_wav, wav_header
+    from audio_cache import AudioCache, DiskLRUCache
+    from cost_model import text_cost
+    from document_processor import DocumentProcessor, TextChunker, split_sentences
+    from extraction_cache import ExtractionCache
+
+# (repo_id, text, sid, speed) -> (sample_rate, pcm16 bytes)
+Synthesize = Callable[[str, str, Optional[int], float], Awaitable[Tuple[int, bytes]]]
+
+# Statuses a job goes through; the last two are final
+QUEUED = "queued"
+EXTRACTING = "extracting"
+SYNTHESIZING = "synthesizing"
+ENCODING = "encoding"
+DONE = "done"
+FAILED = "failed"
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Extracted chunks that may wait for synthesis before extraction pauses
+_EXTRACTION_WINDOW = 4
+
+# Least seconds between two writes of job.json while updates keep coming
+_SAVE_INTERVAL = 0.5
+
+# Seconds between two sweeps for expired jobs
+_EXPIRE_INTERVAL = 600
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def _write_json(path: str, value: Any) -> None:
+    _write_atomic(path, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def _new_sentence_stats() -> Dict[str, Any]:
+    return {
+        "total": 0,
+        "synthesized": 0,
+        "cache_hits": 0,
+        "deduplicated": 0,
+        "reused_audio_seconds": 0.0,
+    }
+
+
+def _read_json(path: str) -> Any:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def _in_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run func in the default executor. When the caller is cancelled, func is
+    still waited for before re-raising: a thread cannot be interrupted, and
+    a cancelled job must not write to its directory once it has stopped.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+class JobManager:
+    """
+    Creates, runs, resumes and reports document synthesis jobs.
+
+    Args:
+        directory: Where job directories are kept, created if missing
+        synthesize: Coroutine function synthesizing one sentence
+        concurrency: Chunks synthesized at the same time, across all jobs
+        cache: Synthesis result cache to reuse sentences from, if any
+        extraction_cache: Cache of extracted document text, if any
+        retention_seconds: Done and failed jobs are removed this long after
+            their last update, 0 = kept until deleted
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        synthesize: Synthesize,
+        concurrency: int,
+        cache: Optional[DiskLRUCache] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        retention_seconds: float = 0,
+    ):
+        self.directory = directory
+        self._synthesize = synthesize
+        self._concurrency = max(1, concurrency)
+        self._cache = cache
+        self._extraction_cache = extraction_cache
+        self._retention_seconds = retention_seconds
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Sentence cache key -> task producing its (sample_rate, pcm, source)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # State of running jobs, and the tasks writing it to their job.json
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        # Running jobs updated since their writer last serialized them
+        self._dirty: Set[str] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_dir(self, job_id: str) -> str:
+        if not _JOB_ID.match(job_id):
+            raise KeyError(job_id)
+        return os.path.join(self.directory, job_id)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "job.json")
+
+    def _chunk_path(self, job_id: str, index: int) -> str:
+        return os.path.join(self._job_dir(job_id), f"chunk-{index:05d}.pcm")
+
+    def create(self, filename: str, source: BinaryIO, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store an uploaded document and the synthesis parameters of a new job.
+
+        Blocking; call it off the event loop. params holds language,
+        repo_id, sid (already resolved), speed, output_format,
+        max_chunk_length and chunking; with chunking "cost", chunks are
+        cut at max_chunk_cost cost units (see cost_model.py) instead of
+        max_chunk_length characters.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+        extension = os.path.splitext(filename)[1].lower()
+        with open(os.path.join(job_dir, "source" + extension), "wb") as f:
+            shutil.copyfileobj(source, f)
+
+        job = {
+            "id": job_id,
+            "filename": filename,
+            "source": "source" + extension,
+            **params,
+            "status": QUEUED,
+            "error": None,
+            "extracted_chunks": 0,
+            # Set once the whole document has been extracted
+            "total_chunks": None,
+            "completed_chunks": 0,
+            "sample_rate": None,
+            "audio_file": None,
+            # How the sentences of the finished chunks were obtained
+            "sentences": _new_sentence_stats(),
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        _write_json(self._job_path(job_id), job)
+        return job
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Return the state of a job. Raises KeyError for unknown ids."""
+        try:
+            job = _read_json(self._job_path(job_id))
+        except FileNotFoundError:
+            raise KeyError(job_id)
+        total = job["total_chunks"]
+        job["progress"] = job["completed_chunks"] / total if total else 0.0
+        if job["status"] == DONE:
+            job["progress"] = 1.0
+        return job
+
+    def audio_path(self, job_id: str) -> Optional[str]:
+        """Path of the finished audio, or None while the job is not done."""
+        job = self.get(job_id)
+        if job["status"] != DONE:
+            return None
+        return os.path.join(self._job_dir(job_id), job["audio_file"])
+
+    async def delete(self, job_id: str) -> None:
+        """Cancel a job if it is running and remove its files."""
+        job_dir = self._job_dir(job_id)
+        if not os.path.isdir(job_dir):
+            raise KeyError(job_id)
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+            # The directory is only removed once the job has stopped writing
+            # chunks and job.json, so it cannot be recreated behind our back
+            await asyncio.wait([task])
+        await self._flush(job_id)
+        await asyncio.get_running_loop().run_in_executor(
+            None, shutil.rmtree, job_dir, True
+        )
+
+    def start(self, job_id: str) -> None:
+        """Run a job in the background on the current event loop."""
+        if job_id in self._tasks:
+            return
+        task = asyncio.ensure_future(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def resume_all(self) -> List[str]:
+        """Restart every job that was interrupted before reaching a final status."""
+        resumed = []
+        for job_id in sorted(os.listdir(self.directory)):
+            if not _JOB_ID.match(job_id):
+                continue
+            try:
+                job = _read_json(self._job_path(job_id))
+            except (FileNotFoundError, ValueError):
+                continue
+            if job["status"] not in (DONE, FAILED):
+                self.start(job_id)
+                resumed.append(job_id)
+        return resumed
+
+    def start_sweeper(self) -> None:
+        """Remove expired jobs now and then on the current event loop, if they expire."""
+        if self._retention_seconds > 0 and self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep())
+
+    def expire(self) -> List[str]:
+        """
+        Remove the done and failed jobs last updated longer than the
+        retention period ago, returning their ids. Blocking; call it off
+        the event loop.
+        """
+        if self._retention_seconds <= 0:
+            return []
+        cutoff = time.time() - self._retention_seconds
+        expired = []
+        for job_id in sorted(os.listdir(self.directory)):
+            if not _JOB_ID.match(job_id) or job_id in self._tasks:
+                continue
+            try:
+                job = _read_json(self._job_path(job_id))
+            except (FileNotFoundError, ValueError):
+                continue
+            if job["status"] in (DONE, FAILED) and job["updated_at"] < cutoff:
+                shutil.rmtree(self._job_dir(job_id), True)
+                expired.append(job_id)
+        return expired
+
+    def shutdown(self) -> None:
+        """Stop running jobs, leaving them to be resumed by the next process."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+    async def _sweep(self) -> None:
+        while True:
+            await _in_thread(self.expire)
+            await asyncio.sleep(_EXPIRE_INTERVAL)
+
+    def _update(self, job_id: str, **changes: Any) -> Dict[str, Any]:
+        """
+        Apply changes to the state of a running job, and have job.json
+        rewritten in a thread. Only called from the event loop thread.
+        """
+        job = self._states[job_id]
+        job.update(changes, updated_at=time.time())
+        if job_id in self._writers:
+            self._dirty.add(job_id)
+        else:
+            self._writers[job_id] = asyncio.ensure_future(self._write_state(job_id))
+        return job
+
+    async def _write_state(self, job_id: str) -> None:
+        # One write at a time per job: updates made meanwhile are saved
+        # together by the next write, at most every _SAVE_INTERVAL seconds
+        try:
+            while True:
+                self._dirty.discard(job_id)
+                data = json.dumps(self._states[job_id], ensure_ascii=False).encode("utf-8")
+                await _in_thread(_write_atomic, self._job_path(job_id), data)
+                if job_id not in self._dirty:
+                    return
+                await asyncio.sleep(_SAVE_INTERVAL)
+        finally:
+            del self._writers[job_id]
+
+    async def _flush(self, job_id: str) -> None:
+        """Wait until job.json holds every update made so far."""
+        writer = self._writers.get(job_id)
+        if writer is not None:
+            await asyncio.shield(writer)
+
+    def _load_state(self, job_id: str) -> Tuple[Dict[str, Any], Set[int]]:
+        """Read job.json and the indices of the chunks already synthesized."""
+        job = _read_json(self._job_path(job_id))
+        finished = {
+            int(name[len("chunk-"):-len(".pcm")])
+            for name in os.listdir(self._job_dir(job_id))
+            if name.startswith("chunk-") and name.endswith(".pcm")
+        }
+        return job, finished
+
+    async def _run(self, job_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        stopped = threading.Event()
+        pending: Set[asyncio.Future] = set()
+        try:
+            job, finished = await _in_thread(self._load_state, job_id)
+            self._states[job_id] = job
+            job = self._update(job_id, status=EXTRACTING, completed_chunks=len(finished))
+
+            # Extraction runs in its own thread and hands chunks over as they
+            # are cut, so synthesis of the first pages starts right away.
+            # At most _EXTRACTION_WINDOW chunks wait to be picked up.
+            chunks: "asyncio.Queue[Any]" = asyncio.Queue()
+            space = threading.Semaphore(_EXTRACTION_WINDOW)
+
+            def put(item: Any) -> bool:
+                while not space.acquire(timeout=0.5):
+                    if stopped.is_set():
+                        return False
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+                return True
+
+            threading.Thread(
+                target=self._extract,
+                args=(job, put),
+                name=f"tts-job-extract-{job_id[:8]}",
+                daemon=True,
+            ).start()
+
+            # Chunks synthesized or waiting for a synthesis slot
+            window = asyncio.Semaphore(self._concurrency + _EXTRACTION_WINDOW)
+            errors: List[BaseException] = []
+
+            def on_chunk_done(task: asyncio.Future) -> None:
+                pending.discard(task)
+                window.release()
+                if task.cancelled():
+                    # Chunks are only cancelled by this job once it stops
+                    if not stopped.is_set():
+                        errors.append(RuntimeError("Synthesis of a chunk was cancelled."))
+                elif task.exception() is not None:
+                    errors.append(task.exception())
+
+            index = 0
+            while True:
+                item = await chunks.get()
+                space.release()
+                if isinstance(item, BaseException):
+                    raise item
+                if errors:
+                    raise errors[0]
+                if item is None:
+                    break
+                if index == 0:
+                    job = self._update(job_id, status=SYNTHESIZING)
+                if index not in finished:
+                    await window.acquire()
+                    task = asyncio.ensure_future(self._synthesize_chunk(job, index, item))
+                    pending.add(task)
+                    task.add_done_callback(on_chunk_done)
+                index += 1
+                self._update(job_id, extracted_chunks=index)
+
+            if index == 0:
+                raise ValueError("No text could be extracted from the document.")
+            job = self._update(job_id, total_chunks=index)
+            while pending and not errors:
+                await asyncio.wait(set(pending), return_when=asyncio.FIRST_COMPLETED)
+            if errors:
+                raise errors[0]
+
+            job = self._update(job_id, status=ENCODING)
+            audio_file = await _in_thread(self._encode, job, index)
+            self._update(job_id, status=DONE, audio_file=audio_file)
+            # The chunks are the checkpoint until job.json says the job is done
+            await self._flush(job_id)
+            await _in_thread(self._remove_chunks, job_id, index)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if job_id in self._states and os.path.isdir(self._job_dir(job_id)):
+                self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            stopped.set()
+            # On the first failure (or cancellation) stop the other chunks,
+            # and wait for them so nothing is written once the job is over
+            for task in list(pending):
+                task.cancel()
+            if pending:
+                await asyncio.wait(list(pending))
+            await self._flush(job_id)
+            self._states.pop(job_id, None)
+
+    def _extract(self, job: Dict[str, Any], put: Callable[[Any], bool]) -> None:
+        """
+        Extraction thread: put() every chunk of the document in order, then
+        None, or the exception that stopped it.
+
+        Chunks are appended to chunks.jsonl as they are cut. Once a job has
+        been extracted completely they are read back from there when it is
+        resumed, instead of parsing the document again.
+        """
+        job_dir = self._job_dir(job["id"])
+        chunks_path = os.path.join(job_dir, "chunks.jsonl")
+        try:
+            if job["total_chunks"] is not None:
+                with open(chunks_path, encoding="utf-8") as f:
+                    for line in f:
+                        if not put(json.loads(line)):
+                            return
+            else:
+                if job.get("chunking") == "cost":
+                    # Chunks of about the same estimated synthesis time
+                    chunker = TextChunker(job["max_chunk_cost"], cost=text_cost)
+                else:
+                    chunker = TextChunker(job["max_chunk_length"])
+                iter_document = (
+                    self._extraction_cache.iter_document
+                    if self._extraction_cache is not None
+                    else DocumentProcessor.iter_document
+                )
+                source_path = os.path.join(job_dir, job["source"])
+                with open(source_path, "rb") as source, open(chunks_path, "w", encoding="utf-8") as out:
+                    for part in iter_document(source, job["filename"]):
+                        for chunk in chunker.feed(part + "\n"):
+                            out.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                            if not put(chunk):
+                                return
+                    for chunk in chunker.flush():
+                        out.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                        if not put(chunk):
+                            return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    async def _synthesize_chunk(self, job: Dict[str, Any], index: int, text: str) -> None:
+        job_id = job["id"]
+        parts = []
+        sources: Counter = Counter()
+        reused_seconds = 0.0
+        sample_rate = job["sample_rate"]
+        async with self._slots:
+            for sentence in split_sentences(text):
+                sample_rate, pcm, source = await self._synthesize_sentence(job, sentence)
+                parts.append(pcm)
+                sources[source] += 1
+                if source != "synthesized":
+                    reused_seconds += len(pcm) / 2 / sample_rate
+        await _in_thread(_write_atomic, self._chunk_path(job_id, index), b"".join(parts))
+
+        job = self._states[job_id]
+        sentences = dict(job.get("sentences") or _new_sentence_stats())
+        sentences["total"] += sum(sources.values())
+        for source, count in sources.items():
+            sentences[source] += count
+        sentences["reused_audio_seconds"] += reused_seconds
+        self._update(
+            job_id,
+            sample_rate=sample_rate,
+            completed_chunks=job["completed_chunks"] + 1,
+            sentences=sentences,
+        )
+
+    async def _synthesize_sentence(self, job: Dict[str, Any], sentence: str) -> Tuple[int, bytes, str]:
+        """
+        Return (sample_rate, pcm, source) for one sentence, where source is
+        "cache_hits", "deduplicated" or "synthesized".
+
+        The lookup and synthesis run in a task of their own that every job
+        waiting for the sentence shares. It is not cancelled with the job
+        that started it, so the others still get the sentence.
+        """
+        key = AudioCache.key(sentence, job["repo_id"], job["sid"], job["speed"], "wav")
+        task = self._in_flight.get(key)
+        if task is not None:
+            sample_rate, pcm, _ = await asyncio.shield(task)
+            return sample_rate, pcm, "deduplicated"
+
+        task = asyncio.ensure_future(self._fetch_sentence(key, job, sentence))
+        self._in_flight[key] = task
+
+        def forget(_: asyncio.Future) -> None:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+            # Retrieve it, so asyncio does not warn when nobody was waiting
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    async def _fetch_sentence(self, key: str, job: Dict[str, Any], sentence: str) -> Tuple[int, bytes, str]:
+        loop = asyncio.get_running_loop()
+        if self._cache is not None:
+            cached = await loop.run_in_executor(None, self._cache.get, key)
+            if cached is not None:
+                sample_rate, pcm = split_wav(cached)
+                return sample_rate, pcm, "cache_hits"
+        sample_rate, pcm = await self._synthesize(
+            job["repo_id"], sentence, job["sid"], job["speed"]
+        )
+        if self._cache is not None:
+            # Stored as WAV, so /api/tts serves the same sentence from it too
+            await loop.run_in_executor(
+                None,
+                self._cache.put,
+                key,
+                wav_header(sample_rate, data_size=len(pcm)) + pcm,
+            )
+        return sample_rate, pcm, "synthesized"
+
+    def _encode(self, job: Dict[str, Any], num_chunks: int) -> str:
+        # Chunks are read and written one at a time, so memory use does not
+        # grow with the length of the document
+        job_dir = self._job_dir(job["id"])
+        _, extension, file_format, subtype = OUTPUT_FORMATS[job["output_format"]]
+        audio_file = "audio." + extension
+        chunk_paths = [self._chunk_path(job["id"], index) for index in range(num_chunks)]
+        sample_rate = job["sample_rate"]
+
+        fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix=".tmp-")
+        try:
+            if job["output_format"] == "wav":
+                # Plain PCM: copy the chunks after a header, without decoding them
+                data_size = sum(os.path.getsize(path) for path in chunk_paths)
+                with os.fdopen(fd, "wb") as out:
+                    out.write(wav_header(sample_rate, data_size=data_size))
+                    for path in chunk_paths:
+                        with open(path, "rb") as f:
+                            shutil.copyfileobj(f, out)
+            else:
+                os.close(fd)
+                rate = encoded_sample_rate(job["output_format"], sample_rate)
+                with sf.SoundFile(
+                    tmp_path,
+                    "w",
+                    samplerate=rate,
+                    channels=1,
+                    format=file_format,
+                    subtype=subtype,
+                ) as out:
+                    for path in chunk_paths:
+                        pcm = np.fromfile(path, dtype="<i2")
+                        if rate != sample_rate:
+                            pcm = resample(pcm.astype(np.float32) / 32768.0, sample_rate, rate)
+                        out.write(pcm)
+            os.replace(tmp_path, os.path.join(job_dir, audio_file))
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return audio_file
+
+    def _remove_chunks(self, job_id: str, num_chunks: int) -> None:
+        for index in range(num_chunks):
+            try:
+                os.unlink(self._chunk_path(job_id, index))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+ASGI middleware for the TTS API.
+"""
+
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import HTTPException
+
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies larger than max_bytes with 413.
+
+    A Content-Length over the limit is rejected before any of the body is
+    read. Bodies without one (chunked uploads) are counted as they are
+    received, and the request fails as soon as the limit is crossed, so an
+    oversize upload is never buffered or spooled in full.
+
+    Args:
+        app: The ASGI app to wrap
+        max_bytes: Largest accepted body, 0 = unlimited
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the limit of {self.max_bytes // (1024 * 1024)} MB."
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > self.max_bytes:
+                await self._reject(send, detail)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so
+                    # this becomes a 413 response rather than a parse error
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -15,113 +15,238 @@
 # limitations under the License.
 
 import os
-from functools import lru_cache
-from pathlib import Path
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 import sherpa_onnx
 from huggingface_hub import hf_hub_download
 
-
-def get_file(
-    repo_id: str,
-    filename: str,
-    subfolder: str = ".",
-) -> str:
-    model_filename = hf_hub_download(
+try:
+    from backend import settings
+    from backend.model_pool import ModelPool
+    from backend.model_store import ArtifactStore
+    from backend.assets import ESPEAK_NG_DATA, JIEBA_DICT, ensure_asset
+except ImportError:
+    import settings
+    from model_pool import ModelPool
+    from model_store import ArtifactStore
+    from assets import ESPEAK_NG_DATA, JIEBA_DICT, ensure_asset
+
+# Files resolved while a model is being loaded on this thread, used to
+# estimate the footprint of the model in the pool.
+_loaded_artifacts = threading.local()
+
+
+_artifact_store: Optional[ArtifactStore] = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """The local artifact store (TTS_MODEL_STORE_DIR), or None to download from Hugging Face."""
+    global _artifact_store
+    if not settings.MODEL_STORE_DIR:
+        return None
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore(settings.MODEL_STORE_DIR)
+        return _artifact_store
+
+
+# Artifacts resolved by this process, and the ones being resolved right now,
+# by (repo_id, filename, subfolder). Loaders that need the same file (the
+# shared hifigan vocoder, replicas of one model) wait for a single fetch.
+_artifact_lock = threading.Lock()
+_resolved_artifacts: Dict[Tuple[str, str, str], str] = {}
+_artifacts_in_flight: Dict[Tuple[str, str, str], Future] = {}
+# "repo_id/filename" -> how long its last fetch took and where it came from
+_artifact_timings: Dict[str, Dict[str, Any]] = {}
+# repo_id -> seconds spent resolving artifacts and creating the session on its last load
+_load_timings: Dict[str, Dict[str, float]] = {}
+
+_artifact_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.ARTIFACT_FETCH_WORKERS),
+    thread_name_prefix="artifact-fetch",
+)
+
+
+def _fetch_artifact(repo_id: str, filename: str, subfolder: str) -> str:
+    store = get_artifact_store()
+    if store is not None:
+        # Offline: only the store's manifest is consulted, no network calls
+        return store.resolve(repo_id, filename, subfolder)
+    return hf_hub_download(
         repo_id=repo_id,
         filename=filename,
         subfolder=subfolder,
     )
-    return model_filename
-
 
-@lru_cache(maxsize=10)
-def _get_vits_vctk(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    assert repo_id == "csukuangfj/vits-vctk"
 
-    model = get_file(
-        repo_id=repo_id,
-        filename="vits-vctk.onnx",
-        subfolder=".",
+def _resolve_artifact(repo_id: str, filename: str, subfolder: str = ".") -> str:
+    key = (repo_id, filename, subfolder)
+    with _artifact_lock:
+        path = _resolved_artifacts.get(key)
+        if path is not None and os.path.exists(path):
+            return path
+        future = _artifacts_in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _artifacts_in_flight[key] = Future()
+    if not owner:
+        return future.result()
+
+    start = time.perf_counter()
+    try:
+        path = _fetch_artifact(repo_id, filename, subfolder)
+    except BaseException as e:
+        with _artifact_lock:
+            del _artifacts_in_flight[key]
+        future.set_exception(e)
+        raise
+    with _artifact_lock:
+        _resolved_artifacts[key] = path
+        del _artifacts_in_flight[key]
+        _artifact_timings[f"{repo_id}/{filename}"] = {
+            "seconds": time.perf_counter() - start,
+            "bytes": os.path.getsize(path),
+            "source": "store" if settings.MODEL_STORE_DIR else "hub",
+        }
+    future.set_result(path)
+    return path
+
+
+def prefetch_artifacts(files: Iterable[Tuple[str, str]]) -> List[str]:
+    """Resolve every (repo_id, filename) in files concurrently, returning their paths."""
+    futures = [
+        _artifact_executor.submit(_resolve_artifact, repo_id, filename)
+        for repo_id, filename in files
+    ]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def get_artifact_stats() -> Dict[str, Any]:
+    with _artifact_lock:
+        return {
+            "in_flight": len(_artifacts_in_flight),
+            "artifacts": {key: dict(value) for key, value in _artifact_timings.items()},
+            "loads": {key: dict(value) for key, value in _load_timings.items()},
+        }
+
+
+class RuntimeOptions(NamedTuple):
+    """ONNX runtime options a model session is created with."""
+
+    num_threads: int
+    provider: str
+    debug: bool
+    max_num_sentences: int
+
+
+# repo_id -> options its loaded sessions were created with
+_runtime_options: Dict[str, RuntimeOptions] = {}
+
+
+def _default_num_threads() -> int:
+    # Each inference worker runs one session at a time, so the cores are
+    # shared among all of them
+    workers = max(1, settings.INFERENCE_WORKERS) * max(1, settings.INFERENCE_PROCESSES)
+    return max(1, (os.cpu_count() or 2) // workers)
+
+
+def _override(overrides: Dict[str, int], repo_id: str, family: str, default: int) -> int:
+    if repo_id in overrides:
+        return overrides[repo_id]
+    return overrides.get(family, default)
+
+
+def runtime_options(repo_id: str) -> RuntimeOptions:
+    """
+    Options for the sessions of repo_id: the TTS_MODEL_* defaults, overridden
+    by its family and then by its repo_id.
+
+    Raises:
+        ValueError: If repo_id is not in the catalog
+    """
+    family = get_model_descriptor(repo_id).family
+    num_threads = settings.MODEL_NUM_THREADS or _default_num_threads()
+    return RuntimeOptions(
+        num_threads=max(1, _override(settings.MODEL_NUM_THREADS_PER_MODEL, repo_id, family, num_threads)),
+        provider=settings.MODEL_PROVIDER,
+        debug=bool(_override(settings.MODEL_DEBUG_PER_MODEL, repo_id, family, settings.MODEL_DEBUG)),
+        max_num_sentences=max(
+            1,
+            _override(
+                settings.MODEL_MAX_NUM_SENTENCES_PER_MODEL,
+                repo_id,
+                family,
+                settings.MODEL_MAX_NUM_SENTENCES,
+            ),
+        ),
     )
 
-    lexicon = get_file(
-        repo_id=repo_id,
-        filename="lexicon.txt",
-        subfolder=".",
-    )
 
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
+# The loaders below build the sherpa-onnx config of a model from the local
+# paths of its artifacts, by role ("model", "tokens", "rule_fsts", ...).
+# Which files fill each role is listed once, in _LOADER_INFO; roles with
+# several files get their paths joined by commas, as sherpa-onnx expects.
+ArtifactPaths = Dict[str, str]
+Loader = Callable[[str, RuntimeOptions, ArtifactPaths], sherpa_onnx.OfflineTts]
+
+
+def _get_vits_vctk(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    repo_id = repo_id.split("|")[0]
+    assert repo_id == "csukuangfj/vits-vctk", repo_id
 
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(
-                model=model,
-                lexicon=lexicon,
-                tokens=tokens,
-                length_scale=1.0 / speed,
+                model=files["model"],
+                lexicon=files["lexicon"],
+                tokens=files["tokens"],
+                length_scale=1.0,
             ),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        max_num_sentences=1,
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_vits_ljs(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    assert repo_id == "csukuangfj/vits-ljs"
-
-    model = get_file(
-        repo_id=repo_id,
-        filename="vits-ljs.onnx",
-        subfolder=".",
-    )
-
-    lexicon = get_file(
-        repo_id=repo_id,
-        filename="lexicon.txt",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
+def _get_vits_ljs(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    repo_id = repo_id.split("|")[0]
+    assert repo_id == "csukuangfj/vits-ljs", repo_id
 
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(
-                model=model,
-                lexicon=lexicon,
-                tokens=tokens,
-                length_scale=1.0 / speed,
+                model=files["model"],
+                lexicon=files["lexicon"],
+                tokens=files["tokens"],
+                length_scale=1.0,
             ),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        max_num_sentences=1,
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_kokoro(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    data_dir = "/tmp/espeak-ng-data"
+def _get_kokoro(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    data_dir = ensure_asset(ESPEAK_NG_DATA)
     repo_id = repo_id.split("|")[0]
     assert repo_id in (
         "csukuangfj/kokoro-en-v0_19",
@@ -129,57 +254,13 @@ def _get_kokoro(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
         "csukuangfj/kokoro-multi-lang-v1_1",
     ), repo_id
 
-    model = get_file(
-        repo_id=repo_id,
-        filename="model.onnx",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
-
-    voices = get_file(
-        repo_id=repo_id,
-        filename="voices.bin",
-        subfolder=".",
-    )
     if repo_id in (
         "csukuangfj/kokoro-multi-lang-v1_0",
         "csukuangfj/kokoro-multi-lang-v1_1",
     ):
-        lexicon_en = get_file(
-            repo_id=repo_id,
-            filename="lexicon-us-en.txt",
-            subfolder=".",
-        )
-        lexicon_zh = get_file(
-            repo_id=repo_id,
-            filename="lexicon-zh.txt",
-            subfolder=".",
-        )
-        lexicon = f"{lexicon_en},{lexicon_zh}"
-
-        date_zh = get_file(
-            repo_id=repo_id,
-            filename="date-zh.fst",
-            subfolder=".",
-        )
-
-        number_zh = get_file(
-            repo_id=repo_id,
-            filename="number-zh.fst",
-            subfolder=".",
-        )
-        phone_zh = get_file(
-            repo_id=repo_id,
-            filename="phone-zh.fst",
-            subfolder=".",
-        )
-        rule_fsts = f"{date_zh},{phone_zh},{number_zh}"
-        dict_dir = "/tmp/dict"
+        lexicon = files["lexicon"]
+        rule_fsts = files["rule_fsts"]
+        dict_dir = ensure_asset(JIEBA_DICT)
     else:
         lexicon = ""
         rule_fsts = ""
@@ -188,19 +269,19 @@ def _get_kokoro(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             kokoro=sherpa_onnx.OfflineTtsKokoroModelConfig(
-                model=model,
-                voices=voices,
-                tokens=tokens,
+                model=files["model"],
+                voices=files["voices"],
+                tokens=files["tokens"],
                 data_dir=data_dir,
-                length_scale=1.0 / speed,
+                length_scale=1.0,
                 lexicon=lexicon,
                 dict_dir=dict_dir,
             ),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        max_num_sentences=1,
+        max_num_sentences=options.max_num_sentences,
         rule_fsts=rule_fsts,
     )
 
@@ -209,449 +290,266 @@ def _get_kokoro(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_vits_piper(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    data_dir = "/tmp/espeak-ng-data"
-    repo_id = repo_id.split("|")[0]
-
+def _vits_piper_model_name(repo_id: str) -> str:
     if "coqui" in repo_id or "vits-mms" in repo_id:
-        name = "model"
+        return "model"
     elif "piper" in repo_id:
         n = len("vits-piper-")
-        name = repo_id.split("/")[1][n:]
+        return repo_id.split("/")[1][n:]
     elif "mimic3" in repo_id:
         n = len("vits-mimic3-")
-        name = repo_id.split("/")[1][n:]
+        return repo_id.split("/")[1][n:]
     else:
         raise ValueError(f"Unsupported {repo_id}")
 
-    if "vits-coqui-uk-mai" in repo_id or "vits-mms" in repo_id:
-        data_dir = ""
 
-    model = get_file(
-        repo_id=repo_id,
-        filename=f"{name}.onnx",
-        subfolder=".",
-    )
+def _get_vits_piper(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    repo_id = repo_id.split("|")[0]
 
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
+    if "vits-coqui-uk-mai" in repo_id or "vits-mms" in repo_id:
+        data_dir = ""
+    else:
+        data_dir = ensure_asset(ESPEAK_NG_DATA)
 
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(
-                model=model,
+                model=files["model"],
                 lexicon="",
                 data_dir=data_dir,
-                tokens=tokens,
-                length_scale=1.0 / speed,
+                tokens=files["tokens"],
+                length_scale=1.0,
             ),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        max_num_sentences=1,
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_vits_mms(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    return _get_vits_piper(repo_id, speed)
+def _get_vits_mms(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    return _get_vits_piper(repo_id, options, files)
 
 
-@lru_cache(maxsize=10)
-def _get_vits_zh_aishell3(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
+def _get_vits_zh_aishell3(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
     repo_id = repo_id.split("|")[0]
     assert repo_id == "csukuangfj/vits-zh-aishell3", repo_id
 
-    model = get_file(
-        repo_id=repo_id,
-        filename="vits-aishell3.onnx",
-        subfolder=".",
-    )
-
-    lexicon = get_file(
-        repo_id=repo_id,
-        filename="lexicon.txt",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
-
-    rule_fsts = ["phone.fst", "date.fst", "number.fst", "new_heteronym.fst"]
-
-    rule_fsts = [
-        get_file(
-            repo_id=repo_id,
-            filename=f,
-            subfolder=".",
-        )
-        for f in rule_fsts
-    ]
-    rule_fsts = ",".join(rule_fsts)
-
-    rule_fars = get_file(
-        repo_id=repo_id,
-        filename="rule.far",
-        subfolder=".",
-    )
-
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(
-                model=model,
-                lexicon=lexicon,
-                tokens=tokens,
-                length_scale=1.0 / speed,
+                model=files["model"],
+                lexicon=files["lexicon"],
+                tokens=files["tokens"],
+                length_scale=1.0,
             ),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        rule_fsts=rule_fsts,
-        rule_fars=rule_fars,
-        max_num_sentences=1,
+        rule_fsts=files["rule_fsts"],
+        rule_fars=files["rule_fars"],
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_matcha_hf_espeak(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
+def _get_matcha_hf_espeak(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
     repo_id = repo_id.split("|")[0]
     assert repo_id in (
         "csukuangfj/matcha-tts-fa_en-khadijah",
         "csukuangfj/matcha-tts-fa_en-musa",
     ), repo_id
 
-    acoustic_model = get_file(
-        repo_id=repo_id,
-        filename="model.onnx",
-        subfolder=".",
-    )
-
-    vocoder = get_file(
-        repo_id="csukuangfj/sherpa-onnx-hifigan",
-        filename="hifigan_v2.onnx",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
-
-    data_dir = "/tmp/espeak-ng-data"
+    data_dir = ensure_asset(ESPEAK_NG_DATA)
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(
-                acoustic_model=acoustic_model,
-                vocoder=vocoder,
-                tokens=tokens,
+                acoustic_model=files["acoustic_model"],
+                vocoder=files["vocoder"],
+                tokens=files["tokens"],
                 lexicon="",
                 data_dir=data_dir,
-                length_scale=1.0 / speed,
+                length_scale=1.0,
             ),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        max_num_sentences=1,
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_matcha_hf(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
+def _get_matcha_hf(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
     repo_id = repo_id.split("|")[0]
     assert repo_id in ("csukuangfj/matcha-icefall-zh-baker",), repo_id
 
-    if repo_id == "csukuangfj/matcha-icefall-zh-baker":
-        acoustic_model = "model-steps-3.onnx"
-
-    if not Path("/tmp/dict").is_dir():
-        os.system(
-            "cd /tmp; curl -SL -O https://github.com/csukuangfj/cppjieba/releases/download/sherpa-onnx-2024-04-19/dict.tar.bz2; tar xvf dict.tar.bz2"
-        )
-    os.system("ls -lh /tmp/dict")
-
-    acoustic_model = get_file(
-        repo_id=repo_id,
-        filename=acoustic_model,
-        subfolder=".",
-    )
-
-    vocoder = get_file(
-        repo_id="csukuangfj/sherpa-onnx-hifigan",
-        filename="hifigan_v2.onnx",
-        subfolder=".",
-    )
-
-    lexicon = get_file(
-        repo_id=repo_id,
-        filename="lexicon.txt",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
-
-    rule_fars = ""
-
-    rule_fsts = ["phone.fst", "date.fst", "number.fst"]
-
-    rule_fsts = [
-        get_file(
-            repo_id=repo_id,
-            filename=f,
-            subfolder=".",
-        )
-        for f in rule_fsts
-    ]
-    rule_fsts = ",".join(rule_fsts)
-
-    dict_dir = "/tmp/dict"
+    dict_dir = ensure_asset(JIEBA_DICT)
 
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(
-                acoustic_model=acoustic_model,
-                vocoder=vocoder,
-                lexicon=lexicon,
-                tokens=tokens,
+                acoustic_model=files["acoustic_model"],
+                vocoder=files["vocoder"],
+                lexicon=files["lexicon"],
+                tokens=files["tokens"],
                 dict_dir=dict_dir,
-                length_scale=1.0 / speed,
+                length_scale=1.0,
             ),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        rule_fsts=rule_fsts,
-        rule_fars=rule_fars,
-        max_num_sentences=1,
+        rule_fsts=files["rule_fsts"],
+        rule_fars="",
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def _get_vits_hf(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    repo_id = repo_id.split("|")[0]
-
+def _vits_hf_model_name(repo_id: str) -> str:
+    if "sherpa-onnx-vits-zh-ll" in repo_id:
+        return "model"
     if "fanchen" in repo_id or "vits-cantonese-hf-xiaomaiiwn" in repo_id:
-        model = repo_id.split("/")[-1]
+        return repo_id.split("/")[-1]
     elif "csukuangfj/vits-melo-tts-zh_en" == repo_id:
-        model = "model"
+        return "model"
     else:
-        model = repo_id.split("-")[-1]
-
-    if "sherpa-onnx-vits-zh-ll" in repo_id:
-        model = "model"
+        return repo_id.split("-")[-1]
 
-    if not Path("/tmp/dict").is_dir():
-        os.system(
-            "cd /tmp; curl -SL -O https://github.com/csukuangfj/cppjieba/releases/download/sherpa-onnx-2024-04-19/dict.tar.bz2; tar xvf dict.tar.bz2"
-        )
-    os.system("ls -lh /tmp/dict")
 
-    model = get_file(
-        repo_id=repo_id,
-        filename=f"{model}.onnx",
-        subfolder=".",
-    )
-
-    lexicon = get_file(
-        repo_id=repo_id,
-        filename="lexicon.txt",
-        subfolder=".",
-    )
-
-    tokens = get_file(
-        repo_id=repo_id,
-        filename="tokens.txt",
-        subfolder=".",
-    )
-
-    rule_fars = ""
+def _get_vits_hf(repo_id: str, options: RuntimeOptions, files: ArtifactPaths) -> sherpa_onnx.OfflineTts:
+    repo_id = repo_id.split("|")[0]
 
     if "vits-cantonese-hf-xiaomaiiwn" not in repo_id:
-        rule_fsts = ["phone.fst", "date.fst", "number.fst"]
-
-        rule_fsts = [
-            get_file(
-                repo_id=repo_id,
-                filename=f,
-                subfolder=".",
-            )
-            for f in rule_fsts
-        ]
-        rule_fsts = ",".join(rule_fsts)
-
-        #  rule_fars = get_file(
-        #      repo_id=repo_id,
-        #      filename="rule.far",
-        #      subfolder=".",
-        #  )
-        vits_dict_dir = "/tmp/dict"
+        vits_dict_dir = ensure_asset(JIEBA_DICT)
     else:
-        rule_fsts = get_file(
-            repo_id=repo_id,
-            filename="rule.fst",
-            subfolder=".",
-        )
         vits_dict_dir = ""
 
     tts_config = sherpa_onnx.OfflineTtsConfig(
         model=sherpa_onnx.OfflineTtsModelConfig(
             vits=sherpa_onnx.OfflineTtsVitsModelConfig(
-                model=model,
-                lexicon=lexicon,
-                tokens=tokens,
+                model=files["model"],
+                lexicon=files["lexicon"],
+                tokens=files["tokens"],
                 dict_dir=vits_dict_dir,
-                length_scale=1.0 / speed,
+                length_scale=1.0,
             ),
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(),
-            provider="cpu",
-            debug=True,
-            num_threads=2,
+            provider=options.provider,
+            debug=options.debug,
+            num_threads=options.num_threads,
         ),
-        rule_fsts=rule_fsts,
-        rule_fars=rule_fars,
-        max_num_sentences=1,
+        rule_fsts=files["rule_fsts"],
+        rule_fars="",
+        max_num_sentences=options.max_num_sentences,
     )
     tts = sherpa_onnx.OfflineTts(tts_config)
 
     return tts
 
 
-@lru_cache(maxsize=10)
-def get_pretrained_model(repo_id: str, speed: float) -> sherpa_onnx.OfflineTts:
-    if repo_id in chinese_models:
-        return chinese_models[repo_id](repo_id, speed)
-    elif repo_id in chinese_english_models:
-        return chinese_english_models[repo_id](repo_id, speed)
-    elif repo_id in persian_english_models:
-        return persian_english_models[repo_id](repo_id, speed)
-    if repo_id in cantonese_models:
-        return cantonese_models[repo_id](repo_id, speed)
-    elif repo_id in english_models:
-        return english_models[repo_id](repo_id, speed)
-    elif repo_id in german_models:
-        return german_models[repo_id](repo_id, speed)
-    elif repo_id in spanish_models:
-        return spanish_models[repo_id](repo_id, speed)
-    elif repo_id in french_models:
-        return french_models[repo_id](repo_id, speed)
-    elif repo_id in ukrainian_models:
-        return ukrainian_models[repo_id](repo_id, speed)
-    elif repo_id in russian_models:
-        return russian_models[repo_id](repo_id, speed)
-    elif repo_id in arabic_models:
-        return arabic_models[repo_id](repo_id, speed)
-    elif repo_id in catalan_models:
-        return catalan_models[repo_id](repo_id, speed)
-    elif repo_id in czech_models:
-        return czech_models[repo_id](repo_id, speed)
-    elif repo_id in danish_models:
-        return danish_models[repo_id](repo_id, speed)
-    elif repo_id in greek_models:
-        return greek_models[repo_id](repo_id, speed)
-    elif repo_id in finnish_models:
-        return finnish_models[repo_id](repo_id, speed)
-    elif repo_id in hungarian_models:
-        return hungarian_models[repo_id](repo_id, speed)
-    elif repo_id in icelandic_models:
-        return icelandic_models[repo_id](repo_id, speed)
-    elif repo_id in italian_models:
-        return italian_models[repo_id](repo_id, speed)
-    elif repo_id in georgian_models:
-        return georgian_models[repo_id](repo_id, speed)
-    elif repo_id in kazakh_models:
-        return kazakh_models[repo_id](repo_id, speed)
-    elif repo_id in luxembourgish_models:
-        return luxembourgish_models[repo_id](repo_id, speed)
-    elif repo_id in nepali_models:
-        return nepali_models[repo_id](repo_id, speed)
-    elif repo_id in dutch_models:
-        return dutch_models[repo_id](repo_id, speed)
-    elif repo_id in norwegian_models:
-        return norwegian_models[repo_id](repo_id, speed)
-    elif repo_id in polish_models:
-        return polish_models[repo_id](repo_id, speed)
-    elif repo_id in portuguese_models:
-        return portuguese_models[repo_id](repo_id, speed)
-    elif repo_id in romanian_models:
-        return romanian_models[repo_id](repo_id, speed)
-    elif repo_id in slovak_models:
-        return slovak_models[repo_id](repo_id, speed)
-    elif repo_id in serbian_models:
-        return serbian_models[repo_id](repo_id, speed)
-    elif repo_id in swedish_models:
-        return swedish_models[repo_id](repo_id, speed)
-    elif repo_id in swahili_models:
-        return swahili_models[repo_id](repo_id, speed)
-    elif repo_id in turkish_models:
-        return turkish_models[repo_id](repo_id, speed)
-    elif repo_id in vietnamese_models:
-        return vietnamese_models[repo_id](repo_id, speed)
-    elif repo_id in bulgarian_models:
-        return bulgarian_models[repo_id](repo_id, speed)
-    elif repo_id in estonian_models:
-        return estonian_models[repo_id](repo_id, speed)
-    elif repo_id in irish_models:
-        return irish_models[repo_id](repo_id, speed)
-    elif repo_id in croatian_models:
-        return croatian_models[repo_id](repo_id, speed)
-    elif repo_id in lithuanian_models:
-        return lithuanian_models[repo_id](repo_id, speed)
-    elif repo_id in latvian_models:
-        return latvian_models[repo_id](repo_id, speed)
-    elif repo_id in maltese_models:
-        return maltese_models[repo_id](repo_id, speed)
-    elif repo_id in slovenian_models:
-        return slovenian_models[repo_id](repo_id, speed)
-    elif repo_id in bengali_models:
-        return bengali_models[repo_id](repo_id, speed)
-    elif repo_id in min_nan_models:
-        return min_nan_models[repo_id](repo_id, speed)
-    elif repo_id in thai_models:
-        return thai_models[repo_id](repo_id, speed)
-    elif repo_id in persian_models:
-        return persian_models[repo_id](repo_id, speed)
-    elif repo_id in korean_models:
-        return korean_models[repo_id](repo_id, speed)
-    elif repo_id in afrikaans_models:
-        return afrikaans_models[repo_id](repo_id, speed)
-    elif repo_id in gujarati_models:
-        return gujarati_models[repo_id](repo_id, speed)
-    elif repo_id in tswana_models:
-        return tswana_models[repo_id](repo_id, speed)
-    elif repo_id in welsh_models:
-        return welsh_models[repo_id](repo_id, speed)
-    else:
-        raise ValueError(f"Unsupported repo_id: {repo_id}")
+_model_pool = ModelPool(
+    budget_bytes=settings.MODEL_POOL_BUDGET_MB * 1024 * 1024,
+    pinned=settings.MODEL_POOL_PINNED,
+    replicas=settings.MODEL_REPLICAS,
+    replicas_per_key=settings.MODEL_REPLICAS_PER_MODEL,
+)
+
+
+def get_pretrained_model(repo_id: str) -> sherpa_onnx.OfflineTts:
+    # Models are built with length_scale=1.0 and the requested speed is
+    # applied per call through generate(..., speed=...), so one instance
+    # serves every speed.
+    return _model_pool.get(repo_id, _load_pretrained_model)
+
+
+@contextmanager
+def checkout_pretrained_model(repo_id: str) -> Iterator[sherpa_onnx.OfflineTts]:
+    # A checked out replica is used by a single thread at a time, so
+    # concurrent requests for one voice never share an ONNX session.
+    with _model_pool.checkout(repo_id, _load_pretrained_model) as tts:
+        yield tts
+
+
+def get_model_pool_stats() -> Dict[str, Any]:
+    stats = _model_pool.stats()
+    with _artifact_lock:
+        for model in stats["models"]:
+            options = _runtime_options.get(model["repo_id"])
+            model["runtime"] = options._asdict() if options is not None else None
+    return stats
+
+
+def pin_model(repo_id: str) -> None:
+    get_model_descriptor(repo_id)
+    _model_pool.pin(repo_id)
+
+
+def unpin_model(repo_id: str) -> None:
+    _model_pool.unpin(repo_id)
+
+
+def hold_model(repo_id: str) -> sherpa_onnx.OfflineTts:
+    """Load the model for repo_id if needed and keep it resident until release_model."""
+    return _model_pool.hold(repo_id, _load_pretrained_model)
+
+
+def release_model(repo_id: str) -> None:
+    _model_pool.release(repo_id)
+
+
+def _load_pretrained_model(repo_id: str) -> Tuple[sherpa_onnx.OfflineTts, int]:
+    # The footprint of a model is estimated from the size of the artifacts
+    # (ONNX weights, voices, lexicons, fsts) its loader resolved.
+    _loaded_artifacts.files = set()
+    try:
+        tts = _create_pretrained_model(repo_id)
+        nbytes = sum(os.path.getsize(f) for f in _loaded_artifacts.files)
+    finally:
+        _loaded_artifacts.files = None
+    _record_loaded_model(repo_id, tts)
+    return tts, nbytes
+
+
+def _create_pretrained_model(repo_id: str) -> sherpa_onnx.OfflineTts:
+    descriptor = get_model_descriptor(repo_id)
+    start = time.perf_counter()
+    # All artifacts are fetched at once up front, and the loader gets their
+    # paths by role
+    paths = dict(zip(descriptor.files, prefetch_artifacts(descriptor.files)))
+    resolved = time.perf_counter()
+    recorded = getattr(_loaded_artifacts, "files", None)
+    if recorded is not None:
+        recorded.update(paths.values())
+    files = {
+        role: ",".join(paths[artifact] for artifact in artifacts)
+        for role, artifacts in descriptor.artifacts.items()
+    }
+    options = runtime_options(repo_id)
+    tts = descriptor.loader(repo_id, options, files)
+    with _artifact_lock:
+        _load_timings[repo_id] = {
+            "artifacts_seconds": resolved - start,
+            "session_seconds": time.perf_counter() - resolved,
+        }
+        _runtime_options[repo_id] = options
+    return tts
 
 
 cantonese_models = {
@@ -1012,56 +910,289 @@ welsh_models = {
     "csukuangfj/vits-piper-cy_GB-gwryw_gogleddol-medium|1 speaker": _get_vits_piper,
 }
 
+_language_catalog = {
+    "English": english_models,
+    "Chinese (Mandarin, 普通话)": chinese_models,
+    "Chinese+English": chinese_english_models,
+    "Persian+English": persian_english_models,
+    "Cantonese (粤语)": cantonese_models,
+    "Min-nan (闽南话)": min_nan_models,
+    "Arabic": arabic_models,
+    "Afrikaans": afrikaans_models,
+    "Bengali": bengali_models,
+    "Bulgarian": bulgarian_models,
+    "Catalan": catalan_models,
+    "Croatian": croatian_models,
+    "Czech": czech_models,
+    "Danish": danish_models,
+    "Dutch": dutch_models,
+    "Estonian": estonian_models,
+    "Finnish": finnish_models,
+    "French": french_models,
+    "Georgian": georgian_models,
+    "German": german_models,
+    "Greek": greek_models,
+    "Gujarati": gujarati_models,
+    "Hungarian": hungarian_models,
+    "Icelandic": icelandic_models,
+    "Irish": irish_models,
+    "Italian": italian_models,
+    "Kazakh": kazakh_models,
+    "Korean": korean_models,
+    "Latvian": latvian_models,
+    "Lithuanian": lithuanian_models,
+    "Luxembourgish": luxembourgish_models,
+    "Maltese": maltese_models,
+    "Nepali": nepali_models,
+    "Norwegian": norwegian_models,
+    "Persian": persian_models,
+    "Polish": polish_models,
+    "Portuguese": portuguese_models,
+    "Romanian": romanian_models,
+    "Russian": russian_models,
+    "Serbian": serbian_models,
+    "Slovak": slovak_models,
+    "Slovenian": slovenian_models,
+    "Spanish": spanish_models,
+    "Swahili": swahili_models,
+    "Swedish": swedish_models,
+    "Thai": thai_models,
+    "Tswana": tswana_models,
+    "Turkish": turkish_models,
+    "Ukrainian": ukrainian_models,
+    "Vietnamese": vietnamese_models,
+    "Welsh": welsh_models,
+}
+
 language_to_models = {
-    "English": list(english_models.keys()),
-    "Chinese (Mandarin, 普通话)": list(chinese_models.keys()),
-    "Chinese+English": list(chinese_english_models.keys()),
-    "Persian+English": list(persian_english_models.keys()),
-    "Cantonese (粤语)": list(cantonese_models.keys()),
-    "Min-nan (闽南话)": list(min_nan_models.keys()),
-    "Arabic": list(arabic_models.keys()),
-    "Afrikaans": list(afrikaans_models.keys()),
-    "Bengali": list(bengali_models.keys()),
-    "Bulgarian": list(bulgarian_models.keys()),
-    "Catalan": list(catalan_models.keys()),
-    "Croatian": list(croatian_models.keys()),
-    "Czech": list(czech_models.keys()),
-    "Danish": list(danish_models.keys()),
-    "Dutch": list(dutch_models.keys()),
-    "Estonian": list(estonian_models.keys()),
-    "Finnish": list(finnish_models.keys()),
-    "French": list(french_models.keys()),
-    "Georgian": list(georgian_models.keys()),
-    "German": list(german_models.keys()),
-    "Greek": list(greek_models.keys()),
-    "Gujarati": list(gujarati_models.keys()),
-    "Hungarian": list(hungarian_models.keys()),
-    "Icelandic": list(icelandic_models.keys()),
-    "Irish": list(irish_models.keys()),
-    "Italian": list(italian_models.keys()),
-    "Kazakh": list(kazakh_models.keys()),
-    "Korean": list(korean_models.keys()),
-    "Latvian": list(latvian_models.keys()),
-    "Lithuanian": list(lithuanian_models.keys()),
-    "Luxembourgish": list(luxembourgish_models.keys()),
-    "Maltese": list(maltese_models.keys()),
-    "Nepali": list(nepali_models.keys()),
-    "Norwegian": list(norwegian_models.keys()),
-    "Persian": list(persian_models.keys()),
-    "Polish": list(polish_models.keys()),
-    "Portuguese": list(portuguese_models.keys()),
-    "Romanian": list(romanian_models.keys()),
-    "Russian": list(russian_models.keys()),
-    "Serbian": list(serbian_models.keys()),
-    "Slovak": list(slovak_models.keys()),
-    "Slovenian": list(slovenian_models.keys()),
-    "Spanish": list(spanish_models.keys()),
-    "Swahili": list(swahili_models.keys()),
-    "Swedish": list(swedish_models.keys()),
-    "Thai": list(thai_models.keys()),
-    "Tswana": list(tswana_models.keys()),
-    "Turkish": list(turkish_models.keys()),
-    "Ukrainian": list(ukrainian_models.keys()),
-    "Vietnamese": list(vietnamese_models.keys()),
-    "Welsh": list(welsh_models.keys()),
+    language: list(models.keys()) for language, models in _language_catalog.items()
 }
+
+
+# (Hugging Face repo, filename) of the artifacts filling each role of a loader
+Artifacts = Dict[str, List[Tuple[str, str]]]
+
+_HIFIGAN = ("csukuangfj/sherpa-onnx-hifigan", "hifigan_v2.onnx")
+
+
+def _vits_lexicon_artifacts(model: str) -> Callable[[str], Artifacts]:
+    return lambda r: {
+        "model": [(r, model)],
+        "lexicon": [(r, "lexicon.txt")],
+        "tokens": [(r, "tokens.txt")],
+    }
+
+
+def _kokoro_artifacts(repo_id: str) -> Artifacts:
+    artifacts = {
+        "model": [(repo_id, "model.onnx")],
+        "tokens": [(repo_id, "tokens.txt")],
+        "voices": [(repo_id, "voices.bin")],
+    }
+    if "multi-lang" in repo_id:
+        artifacts["lexicon"] = [(repo_id, "lexicon-us-en.txt"), (repo_id, "lexicon-zh.txt")]
+        artifacts["rule_fsts"] = [
+            (repo_id, name) for name in ("date-zh.fst", "phone-zh.fst", "number-zh.fst")
+        ]
+    return artifacts
+
+
+def _vits_piper_artifacts(repo_id: str) -> Artifacts:
+    return {
+        "model": [(repo_id, f"{_vits_piper_model_name(repo_id)}.onnx")],
+        "tokens": [(repo_id, "tokens.txt")],
+    }
+
+
+def _vits_zh_aishell3_artifacts(repo_id: str) -> Artifacts:
+    return {
+        **_vits_lexicon_artifacts("vits-aishell3.onnx")(repo_id),
+        "rule_fsts": [
+            (repo_id, name)
+            for name in ("phone.fst", "date.fst", "number.fst", "new_heteronym.fst")
+        ],
+        "rule_fars": [(repo_id, "rule.far")],
+    }
+
+
+def _matcha_hf_espeak_artifacts(repo_id: str) -> Artifacts:
+    return {
+        "acoustic_model": [(repo_id, "model.onnx")],
+        "vocoder": [_HIFIGAN],
+        "tokens": [(repo_id, "tokens.txt")],
+    }
+
+
+def _matcha_hf_artifacts(repo_id: str) -> Artifacts:
+    return {
+        "acoustic_model": [(repo_id, "model-steps-3.onnx")],
+        "vocoder": [_HIFIGAN],
+        "lexicon": [(repo_id, "lexicon.txt")],
+        "tokens": [(repo_id, "tokens.txt")],
+        "rule_fsts": [(repo_id, name) for name in ("phone.fst", "date.fst", "number.fst")],
+    }
+
+
+def _vits_hf_artifacts(repo_id: str) -> Artifacts:
+    artifacts = _vits_lexicon_artifacts(f"{_vits_hf_model_name(repo_id)}.onnx")(repo_id)
+    if "vits-cantonese-hf-xiaomaiiwn" in repo_id:
+        artifacts["rule_fsts"] = [(repo_id, "rule.fst")]
+    else:
+        artifacts["rule_fsts"] = [
+            (repo_id, name) for name in ("phone.fst", "date.fst", "number.fst")
+        ]
+    return artifacts
+
+
+# Loader -> (family, artifacts of a repo_id without the "|" label by role).
+# The only list of the files a model needs: the loader gets their paths
+# from here, the store and the prefetch download exactly these.
+_LOADER_INFO: Dict[Loader, Tuple[str, Callable[[str], Artifacts]]] = {
+    _get_vits_vctk: ("vits", _vits_lexicon_artifacts("vits-vctk.onnx")),
+    _get_vits_ljs: ("vits", _vits_lexicon_artifacts("vits-ljs.onnx")),
+    _get_kokoro: ("kokoro", _kokoro_artifacts),
+    _get_vits_piper: ("piper", _vits_piper_artifacts),
+    _get_vits_mms: ("mms", _vits_piper_artifacts),
+    _get_vits_zh_aishell3: ("vits", _vits_zh_aishell3_artifacts),
+    _get_matcha_hf_espeak: ("matcha", _matcha_hf_espeak_artifacts),
+    _get_matcha_hf: ("matcha", _matcha_hf_artifacts),
+    _get_vits_hf: ("vits", _vits_hf_artifacts),
+}
+
+# Output sample rates known without loading the model, by family (piper by
+# quality). Others are filled in the first time the model is loaded.
+_FAMILY_SAMPLE_RATES = {
+    "kokoro": 24000,
+    "matcha": 22050,
+    "mms": 16000,
+    "piper-x_low": 16000,
+    "piper-low": 16000,
+    "piper-medium": 22050,
+    "piper-high": 22050,
+}
+_REPO_SAMPLE_RATES = {
+    "csukuangfj/vits-vctk": 22050,
+    "csukuangfj/vits-ljs": 22050,
+    "csukuangfj/vits-zh-aishell3": 8000,
+    "csukuangfj/vits-melo-tts-zh_en": 44100,
+}
+
+_SPEAKERS_LABEL = re.compile(r"\|(\d+)")
+_PIPER_QUALITIES = ("x_low", "low", "medium", "high")
+
+
+class ModelDescriptor(NamedTuple):
+    """What the catalog knows about a model, without loading it."""
+
+    repo_id: str
+    family: str
+    # Voice quality of piper models (x_low, low, medium, high), else None
+    quality: Optional[str]
+    loader: Loader
+    languages: Tuple[str, ...]
+    # Role -> (Hugging Face repo, filename) of the artifacts the loader gets
+    artifacts: Dict[str, Tuple[Tuple[str, str], ...]]
+    # Every artifact of the model, once
+    files: Tuple[Tuple[str, str], ...]
+    # None until known from the catalog label or a load
+    num_speakers: Optional[int]
+    sample_rate: Optional[int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "repo_id": self.repo_id,
+            "family": self.family,
+            "quality": self.quality,
+            "languages": list(self.languages),
+            "files": [{"repo_id": repo, "filename": name} for repo, name in self.files],
+            "num_speakers": self.num_speakers,
+            "sample_rate": self.sample_rate,
+        }
+
+
+def _describe(repo_id: str, loader, languages: Tuple[str, ...]) -> ModelDescriptor:
+    repo = repo_id.split("|")[0]
+    family, artifacts_of = _LOADER_INFO[loader]
+    if family == "piper":
+        if "coqui" in repo:
+            family = "coqui"
+        elif "mimic3" in repo:
+            family = "mimic3"
+    elif "melo-tts" in repo:
+        family = "melo"
+
+    quality = None
+    if family == "piper" and repo.rsplit("-", 1)[-1] in _PIPER_QUALITIES:
+        quality = repo.rsplit("-", 1)[-1]
+
+    sample_rate = _REPO_SAMPLE_RATES.get(repo)
+    if sample_rate is None and quality is not None:
+        sample_rate = _FAMILY_SAMPLE_RATES.get(f"piper-{quality}")
+    elif sample_rate is None:
+        sample_rate = _FAMILY_SAMPLE_RATES.get(family)
+
+    artifacts = {role: tuple(files) for role, files in artifacts_of(repo).items()}
+    label = _SPEAKERS_LABEL.search(repo_id)
+    return ModelDescriptor(
+        repo_id=repo_id,
+        family=family,
+        quality=quality,
+        loader=loader,
+        languages=languages,
+        artifacts=artifacts,
+        files=tuple(dict.fromkeys(f for files in artifacts.values() for f in files)),
+        num_speakers=int(label.group(1)) if label else None,
+        sample_rate=sample_rate,
+    )
+
+
+def _build_registry() -> Dict[str, ModelDescriptor]:
+    loaders: Dict[str, Loader] = {}
+    languages: Dict[str, List[str]] = {}
+    for language, models in _language_catalog.items():
+        for repo_id, loader in models.items():
+            loaders[repo_id] = loader
+            languages.setdefault(repo_id, []).append(language)
+    return {
+        repo_id: _describe(repo_id, loader, tuple(languages[repo_id]))
+        for repo_id, loader in loaders.items()
+    }
+
+
+# repo_id -> descriptor of every model in the catalog
+model_registry: Dict[str, ModelDescriptor] = _build_registry()
+
+
+def _check_runtime_overrides() -> None:
+    # A misspelled key would otherwise be ignored without notice
+    known = set(model_registry) | {d.family for d in model_registry.values()}
+    for name, overrides in (
+        ("TTS_MODEL_NUM_THREADS_PER_MODEL", settings.MODEL_NUM_THREADS_PER_MODEL),
+        ("TTS_MODEL_DEBUG_PER_MODEL", settings.MODEL_DEBUG_PER_MODEL),
+        ("TTS_MODEL_MAX_NUM_SENTENCES_PER_MODEL", settings.MODEL_MAX_NUM_SENTENCES_PER_MODEL),
+    ):
+        unknown = sorted(set(overrides) - known)
+        if unknown:
+            raise ValueError(
+                f"Environment variable {name} names unknown models or families: {', '.join(unknown)}"
+            )
+
+
+_check_runtime_overrides()
+
+
+def get_model_descriptor(repo_id: str) -> ModelDescriptor:
+    try:
+        return model_registry[repo_id]
+    except KeyError:
+        raise ValueError(f"Unsupported repo_id: {repo_id}") from None
+
+
+def _record_loaded_model(repo_id: str, tts: sherpa_onnx.OfflineTts) -> None:
+    # A loaded model is the authority on what the catalog could only guess
+    descriptor = model_registry[repo_id]
+    loaded = descriptor._replace(
+        num_speakers=tts.num_speakers, sample_rate=tts.sample_rate
+    )
+    if loaded != descriptor:
+        model_registry[repo_id] = loaded
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Memory-budgeted pool of loaded TTS models.
+
+Models are kept in least-recently-used order together with an estimate of
+their footprint in bytes. When the resident total goes over the budget the
+least recently used models that are not pinned or held are evicted.
+
+Each model can have several replicas. Synthesis checks a replica out, so a
+replica is only ever used by one thread at a time; extra replicas are
+loaded on demand up to the configured count when all are busy.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = (
+        "model",
+        "nbytes",
+        "loaded_at",
+        "last_used",
+        "hits",
+        "max_replicas",
+        "replicas",
+        "growing",
+        "idle",
+        "cond",
+        "checkouts",
+        "waiting",
+        "wait_seconds",
+        "max_wait_seconds",
+    )
+
+    def __init__(self, model: Any, nbytes: int, max_replicas: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+        self.max_replicas = max(1, max_replicas)
+        self.replicas = 1
+        self.growing = 0
+        self.idle = [model]
+        self.cond = threading.Condition()
+        self.checkouts = 0
+        self.waiting = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+
+class ModelPool:
+    """
+    Byte-aware LRU cache of loaded models.
+
+    Args:
+        budget_bytes: Maximum estimated footprint of resident models,
+            0 disables eviction
+        pinned: Keys that are never evicted
+        replicas: Default number of replicas per model
+        replicas_per_key: Replica counts overriding the default for some keys
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        pinned: Iterable[str] = (),
+        replicas: int = 1,
+        replicas_per_key: Optional[Dict[str, int]] = None,
+    ):
+        self._budget_bytes = budget_bytes
+        self._pinned = set(pinned)
+        # Holds taken by sessions (e.g. websocket connections) per key; a held
+        # key is not evicted, whatever the pins set through pin() and unpin()
+        self._held: Counter = Counter()
+        self._replicas = replicas
+        self._replicas_per_key = dict(replicas_per_key or {})
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str, load: Callable[[str], Tuple[Any, int]]) -> Any:
+        """
+        Return the first replica of the model for key, loading it with
+        load(key) on a miss.
+
+        load must return a (model, nbytes) tuple. Concurrent misses on the
+        same key share a single load. The returned model may be in use by
+        another thread; use checkout() to run inference on it.
+        """
+        return self._get_entry(key, load).model
+
+    @contextmanager
+    def checkout(self, key: str, load: Callable[[str], Tuple[Any, int]]) -> Iterator[Any]:
+        """
+        Check out a replica of the model for key for exclusive use.
+
+        Waits for a replica to be checked in when all of them are busy and
+        the replica count for key is reached, otherwise loads a new one.
+        """
+        entry = self._get_entry(key, load)
+
+        start = time.perf_counter()
+        model = None
+        with entry.cond:
+            entry.waiting += 1
+            while True:
+                if entry.idle:
+                    model = entry.idle.pop()
+                    break
+                if entry.replicas + entry.growing < entry.max_replicas:
+                    entry.growing += 1
+                    break
+                entry.cond.wait()
+            entry.waiting -= 1
+            waited = time.perf_counter() - start
+            entry.checkouts += 1
+            entry.wait_seconds += waited
+            entry.max_wait_seconds = max(entry.max_wait_seconds, waited)
+
+        if model is None:
+            try:
+                model, nbytes = load(key)
+            except BaseException:
+                with entry.cond:
+                    entry.growing -= 1
+                    entry.cond.notify()
+                raise
+            with entry.cond:
+                entry.growing -= 1
+                entry.replicas += 1
+            with self._lock:
+                entry.nbytes += nbytes
+                if self._entries.get(key) is entry:
+                    self._resident_bytes += nbytes
+                    self._evict(keep=key)
+
+        try:
+            yield model
+        finally:
+            with entry.cond:
+                entry.idle.append(model)
+                entry.cond.notify()
+
+    def _get_entry(self, key: str, load: Callable[[str], Tuple[Any, int]]) -> _Entry:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Another thread may have finished loading while we waited
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry
+                self._misses += 1
+
+            model, nbytes = load(key)
+
+            with self._lock:
+                entry = _Entry(
+                    model, nbytes, self._replicas_per_key.get(key, self._replicas)
+                )
+                self._entries[key] = entry
+                self._resident_bytes += nbytes
+                self._evict(keep=key)
+            return entry
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry.last_used = time.time()
+        entry.hits += 1
+        self._hits += 1
+        return entry
+
+    def _evict(self, keep: str) -> None:
+        if self._budget_bytes <= 0:
+            return
+        for key in list(self._entries):
+            if self._resident_bytes <= self._budget_bytes:
+                break
+            if key == keep or key in self._pinned or key in self._held:
+                continue
+            entry = self._entries.pop(key)
+            self._resident_bytes -= entry.nbytes
+            self._evictions += 1
+
+    def evict(self, key: str) -> bool:
+        """Drop key from the pool, even if pinned. Returns True if it was resident."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self._resident_bytes -= entry.nbytes
+            self._evictions += 1
+            return True
+
+    def hold(self, key: str, load: Callable[[str], Tuple[Any, int]]) -> Any:
+        """
+        Like get(), but the model is not evicted until release(key) is
+        called as many times as hold(key). Holds are counted separately from
+        pins, so sessions holding a model never undo each other or a pin.
+        """
+        with self._lock:
+            self._held[key] += 1
+        try:
+            return self._get_entry(key, load).model
+        except BaseException:
+            self.release(key)
+            raise
+
+    def release(self, key: str) -> None:
+        """Drop one hold taken with hold(key)."""
+        with self._lock:
+            self._held[key] -= 1
+            if self._held[key] <= 0:
+                del self._held[key]
+                self._evict(keep="")
+
+    def pin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict(keep="")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            models: List[Dict[str, Any]] = [
+                {
+                    "repo_id": key,
+                    "bytes": entry.nbytes,
+                    "pinned": key in self._pinned,
+                    "held": self._held.get(key, 0),
+                    "hits": entry.hits,
+                    "loaded_at": entry.loaded_at,
+                    "last_used": entry.last_used,
+                    "replicas": entry.replicas,
+                    "max_replicas": entry.max_replicas,
+                    "in_use": entry.replicas - len(entry.idle),
+                    "waiting": entry.waiting,
+                    "checkouts": entry.checkouts,
+                    "wait_seconds_total": entry.wait_seconds,
+                    "wait_seconds_avg": (
+                        entry.wait_seconds / entry.checkouts if entry.checkouts else 0.0
+                    ),
+                    "wait_seconds_max": entry.max_wait_seconds,
+                }
+                for key, entry in self._entries.items()
+            ]
+            return {
+                "budget_bytes": self._budget_bytes,
+                "default_replicas": self._replicas,
+                "resident_bytes": self._resident_bytes,
+                "resident_models": len(self._entries),
+                "pinned": sorted(self._pinned),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                # Least recently used first
+                "models": models,
+            }
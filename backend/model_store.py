@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Local store of model artifacts, for hosts without access to Hugging Face.
+
+A store is a directory holding the artifacts of a subset of the catalog,
+laid out as <repo_id>/<filename>, and a manifest.json listing every file
+with its size and SHA-256. When TTS_MODEL_STORE_DIR points to a store,
+model artifacts are resolved from the manifest only: no network calls,
+and a file missing from the store fails the load right away.
+
+Populate and check a store with the CLI (from the repository root):
+
+    python -m backend.model_store populate --dir ./models --language English
+    python -m backend.model_store populate --dir ./models --repo-id "csukuangfj/vits-ljs|1 speaker"
+    python -m backend.model_store verify --dir ./models
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_FILE = "manifest.json"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def artifact_key(repo_id: str, filename: str, subfolder: str = ".") -> str:
+    """Path of an artifact in a store, relative to its directory."""
+    if subfolder not in ("", "."):
+        filename = f"{subfolder}/{filename}"
+    return f"{repo_id}/{filename}"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("files", {})
+    manifest.setdefault("models", {})
+    return manifest
+
+
+def _write_manifest(directory: str, manifest: Dict[str, Any]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+class ArtifactStore:
+    """
+    Resolves model artifacts from a populated store directory.
+
+    The manifest is read once, when the store is opened.
+
+    Args:
+        directory: Store directory containing manifest.json
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        try:
+            self._files: Dict[str, Dict[str, Any]] = _read_manifest(directory)["files"]
+        except FileNotFoundError:
+            raise RuntimeError(
+                f"No {MANIFEST_FILE} in model store {directory}. "
+                "Populate it with: python -m backend.model_store populate"
+            ) from None
+
+    def resolve(self, repo_id: str, filename: str, subfolder: str = ".") -> str:
+        """
+        Return the local path of an artifact.
+
+        Raises:
+            FileNotFoundError: If the artifact is not in the manifest, or
+                its file is missing or does not have the recorded size
+        """
+        key = artifact_key(repo_id, filename, subfolder)
+        entry = self._files.get(key)
+        if entry is None:
+            raise FileNotFoundError(
+                f"{key} is not in the model store {self.directory}. "
+                "Add its model with: python -m backend.model_store populate"
+            )
+        path = os.path.join(self.directory, key)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        if size != entry["size"]:
+            raise FileNotFoundError(
+                f"{path} is missing or incomplete (expected {entry['size']} bytes). "
+                "Check the store with: python -m backend.model_store verify"
+            )
+        return path
+
+
+def populate(
+    directory: str,
+    models: Dict[str, Iterable[Tuple[str, str]]],
+    download: Callable[..., str],
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    Copy the artifacts of models into the store and record them in its manifest.
+
+    Files already in the store with the recorded size are kept. The
+    manifest is rewritten after every model, so an interrupted run keeps
+    what it finished.
+
+    Args:
+        directory: Store directory, created if missing
+        models: repo_id -> (Hugging Face repo, filename) of its artifacts
+        download: hf_hub_download-like function returning a local path
+        log: Progress output
+
+    Returns:
+        The updated manifest
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        manifest = _read_manifest(directory)
+    except FileNotFoundError:
+        manifest = {"version": 1, "files": {}, "models": {}}
+
+    for repo_id, files in models.items():
+        keys = []
+        for repo, filename in files:
+            key = artifact_key(repo, filename)
+            keys.append(key)
+            path = os.path.join(directory, key)
+            entry = manifest["files"].get(key)
+            if entry is not None and os.path.isfile(path) and os.path.getsize(path) == entry["size"]:
+                continue
+            source = download(repo_id=repo, filename=filename, subfolder=".")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Copied next to its final path and renamed, so a store is never
+            # left with a partial file under the artifact's name
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            os.close(fd)
+            try:
+                shutil.copyfile(source, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            manifest["files"][key] = {"size": os.path.getsize(path), "sha256": _sha256(path)}
+            log(f"  {key} ({manifest['files'][key]['size']} bytes)")
+        manifest["models"][repo_id] = keys
+        _write_manifest(directory, manifest)
+        log(f"Stored {repo_id}")
+    return manifest
+
+
+def verify(directory: str, checksums: bool = True) -> List[str]:
+    """Return a description of every file in the manifest that is missing or corrupt."""
+    problems = []
+    for key, entry in sorted(_read_manifest(directory)["files"].items()):
+        path = os.path.join(directory, key)
+        if not os.path.isfile(path):
+            problems.append(f"missing: {key}")
+        elif os.path.getsize(path) != entry["size"]:
+            problems.append(f"wrong size: {key}")
+        elif checksums and _sha256(path) != entry["sha256"]:
+            problems.append(f"checksum mismatch: {key}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    populate_parser = commands.add_parser("populate", help="Download models into a store")
+    populate_parser.add_argument("--dir", required=True, help="Store directory")
+    populate_parser.add_argument("--repo-id", action="append", default=[], help="Catalog repo_id, repeatable")
+    populate_parser.add_argument("--language", action="append", default=[], help="Every model of a language, repeatable")
+    populate_parser.add_argument("--all", action="store_true", help="The whole catalog")
+
+    verify_parser = commands.add_parser("verify", help="Check the files of a store against its manifest")
+    verify_parser.add_argument("--dir", required=True, help="Store directory")
+    verify_parser.add_argument("--quick", action="store_true", help="Check sizes only, not checksums")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "verify":
+        problems = verify(args.dir, checksums=not args.quick)
+        for problem in problems:
+            print(problem)
+        print("OK" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+
+    try:
+        from backend.model import language_to_models, model_registry
+    except ImportError:
+        from model import language_to_models, model_registry
+    from huggingface_hub import hf_hub_download
+
+    selected = set(args.repo_id)
+    for language in args.language:
+        if language not in language_to_models:
+            parser.error(f"Unknown language: {language}")
+        selected.update(language_to_models[language])
+    if args.all:
+        selected.update(model_registry)
+    if not selected:
+        parser.error("Select models with --repo-id, --language or --all")
+    unknown = selected - set(model_registry)
+    if unknown:
+        parser.error(f"Unknown repo_id(s): {', '.join(sorted(unknown))}")
+
+    populate(
+        args.dir,
+        {repo_id: model_registry[repo_id].files for repo_id in sorted(selected)},
+        download=hf_hub_download,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Runtime settings for the Testupavois TTS backend.
+
+Every value is read once from the environment at import time so it can be
+set from docker-compose.yml or start.sh without touching the code.
+"""
+
+import os
+from typing import Dict, List
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {name} must be an integer, got {value!r}")
+
+
+def _env_list(name: str) -> List[str]:
+    value = os.environ.get(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _env_int_mapping(name: str) -> Dict[str, int]:
+    """Parse "key=value,key=value" into a dict of ints."""
+    mapping = {}
+    for item in _env_list(name):
+        key, sep, value = item.rpartition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Environment variable {name} expects key=value items, got {item!r}")
+        try:
+            mapping[key.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Environment variable {name} expects integer values, got {item!r}")
+    return mapping
+
+
+# Model pool: total estimated footprint of resident models, in MiB (0 = unlimited)
+MODEL_POOL_BUDGET_MB = _env_int("TTS_MODEL_POOL_BUDGET_MB", 2048)
+# Comma-separated repo_ids that are never evicted from the model pool
+MODEL_POOL_PINNED = _env_list("TTS_MODEL_POOL_PINNED")
+# Replicas loaded per model so that concurrent requests for one voice run in parallel
+MODEL_REPLICAS = _env_int("TTS_MODEL_REPLICAS", 1)
+# Per-model replica counts, e.g. "csukuangfj/vits-piper-en_US-lessac-medium|1 speaker=4"
+MODEL_REPLICAS_PER_MODEL = _env_int_mapping("TTS_MODEL_REPLICAS_PER_MODEL")
+
+# Inference executor: concurrent synthesis jobs (each ONNX session uses its own
+# threads). With TTS_INFERENCE_PROCESSES this is the number per worker process.
+INFERENCE_WORKERS = _env_int("TTS_INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+# Maximum number of synthesis jobs waiting for a worker before requests get 503 (0 = unlimited)
+INFERENCE_MAX_QUEUE = _env_int("TTS_INFERENCE_MAX_QUEUE", 64)
+# Worker processes that each own a shard of the model catalog (0 = run in-process)
+INFERENCE_PROCESSES = _env_int("TTS_INFERENCE_PROCESSES", 0)
+
+# ONNX runtime options of every model session. num_threads are the intra-op
+# threads of one session (0 = the cores divided among the inference workers).
+# max_num_sentences above 1 synthesizes several sentences per call, but
+# streamed responses then get one segment per group of sentences.
+MODEL_NUM_THREADS = _env_int("TTS_MODEL_NUM_THREADS", 0)
+MODEL_PROVIDER = os.environ.get("TTS_MODEL_PROVIDER", "cpu").strip() or "cpu"
+MODEL_DEBUG = _env_int("TTS_MODEL_DEBUG", 0)
+MODEL_MAX_NUM_SENTENCES = _env_int("TTS_MODEL_MAX_NUM_SENTENCES", 1)
+# Overrides by model family (kokoro, piper, vits, ...) or repo_id, e.g.
+# "kokoro=4,csukuangfj/vits-ljs|1 speaker=1"; a repo_id wins over its family
+MODEL_NUM_THREADS_PER_MODEL = _env_int_mapping("TTS_MODEL_NUM_THREADS_PER_MODEL")
+MODEL_DEBUG_PER_MODEL = _env_int_mapping("TTS_MODEL_DEBUG_PER_MODEL")
+MODEL_MAX_NUM_SENTENCES_PER_MODEL = _env_int_mapping("TTS_MODEL_MAX_NUM_SENTENCES_PER_MODEL")
+
+# Local model artifact store populated with `python -m backend.model_store`.
+# When set, models are loaded from it only, without contacting Hugging Face.
+MODEL_STORE_DIR = os.environ.get("TTS_MODEL_STORE_DIR", "")
+# Artifacts of a model (weights, tokens, lexicons, fsts) resolved at the same time
+ARTIFACT_FETCH_WORKERS = _env_int("TTS_ARTIFACT_FETCH_WORKERS", 8)
+
+# Where espeak-ng-data and the jieba dict are unpacked on first use, and a
+# directory with their release tarballs to install them without network access
+ASSETS_DIR = os.environ.get("TTS_ASSETS_DIR", "/tmp")
+ASSET_TARBALLS_DIR = os.environ.get("TTS_ASSET_TARBALLS_DIR", "")
+
+# repo_ids loaded and warmed up on startup; /api/ready reports 503 until done
+PRELOAD_MODELS = _env_list("TTS_PRELOAD_MODELS")
+
+# Synthesis result cache shared by all processes on the host (0 MiB = disabled)
+AUDIO_CACHE_DIR = os.environ.get("TTS_AUDIO_CACHE_DIR", "/tmp/tts_result_cache")
+AUDIO_CACHE_MAX_MB = _env_int("TTS_AUDIO_CACHE_MAX_MB", 1024)
+
+# Text extracted from uploaded documents, keyed by content hash (0 MiB = disabled)
+EXTRACTION_CACHE_DIR = os.environ.get("TTS_EXTRACTION_CACHE_DIR", "/tmp/tts_extraction_cache")
+EXTRACTION_CACHE_MAX_MB = _env_int("TTS_EXTRACTION_CACHE_MAX_MB", 256)
+
+# /api/tts/batch: maximum items per request and how many run at the same time
+BATCH_MAX_ITEMS = _env_int("TTS_BATCH_MAX_ITEMS", 1000)
+BATCH_CONCURRENCY = _env_int(
+    "TTS_BATCH_CONCURRENCY", INFERENCE_WORKERS * max(1, INFERENCE_PROCESSES)
+)
+
+# Document synthesis jobs: where their state and audio are kept, and how many
+# chunks (across all jobs) are synthesized at the same time
+JOBS_DIR = os.environ.get("TTS_JOBS_DIR", "/tmp/tts_jobs")
+JOBS_CONCURRENCY = _env_int(
+    "TTS_JOBS_CONCURRENCY", INFERENCE_WORKERS * max(1, INFERENCE_PROCESSES)
+)
+# Default estimated synthesis seconds per chunk for jobs using chunking=cost
+JOB_CHUNK_SECONDS = _env_int("TTS_JOB_CHUNK_SECONDS", 10)
+# Done and failed jobs are deleted this many hours after they finished (0 = kept until deleted)
+JOBS_RETENTION_HOURS = _env_int("TTS_JOBS_RETENTION_HOURS", 24)
+
+# PDF text extraction: processes sharing the page range of one document
+# (0 or 1 = extract in the calling thread; at most one per core), used from
+# this many pages on
+PDF_WORKERS = _env_int("TTS_PDF_WORKERS", 0)
+PDF_PARALLEL_MIN_PAGES = _env_int("TTS_PDF_PARALLEL_MIN_PAGES", 32)
+
+# Uploads: largest accepted request body, and the size past which uploaded
+# files are spooled to disk instead of held in memory
+MAX_UPLOAD_MB = _env_int("TTS_MAX_UPLOAD_MB", 200)
+UPLOAD_SPOOL_MB = _env_int("TTS_UPLOAD_SPOOL_MB", 1)
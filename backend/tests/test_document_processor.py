@@ -0,0 +1,62 @@
+"""
+Fragmented input must give the same sentences and chunks as the whole text.
+"""
+
+import pytest
+
+from backend.document_processor import (
+    DocumentProcessor,
+    SentenceBuffer,
+    TextChunker,
+    split_sentences,
+)
+
+TEXTS = [
+    "First sentence. Second one!  Third?\nFourth without an end",
+    "Dr. Smith arrived... then left.  Done!?  Yes.",
+    "你好。世界！你好吗？我很好。",
+    "他说：“你好。”然后走了。",
+    "「真的吗？」她问。『是的！』",
+    "等一下。。。好！？结束。 Then English. 再见！",
+    "括号（注释。）之后。  Spaces。\n\n换行？",
+    "Mixed. 中文。English! 结束？",
+]
+
+# Small enough that the texts above make several chunks
+MAX_LENGTH = 12
+
+
+def _feed_sentences(fragments):
+    buffer = SentenceBuffer()
+    sentences = [sentence for fragment in fragments for sentence in buffer.feed(fragment)]
+    return sentences + buffer.flush()
+
+
+def _feed_chunks(fragments):
+    chunker = TextChunker(MAX_LENGTH)
+    chunks = [chunk for fragment in fragments for chunk in chunker.feed(fragment)]
+    return chunks + chunker.flush()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_split_at_every_offset(text):
+    sentences = split_sentences(text)
+    chunks = DocumentProcessor.format_text_for_tts(text, MAX_LENGTH)
+    for offset in range(len(text) + 1):
+        fragments = [text[:offset], text[offset:]]
+        assert _feed_sentences(fragments) == sentences, offset
+        assert _feed_chunks(fragments) == chunks, offset
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_one_character_at_a_time(text):
+    assert _feed_sentences(list(text)) == split_sentences(text)
+    assert _feed_chunks(list(text)) == DocumentProcessor.format_text_for_tts(text, MAX_LENGTH)
+
+
+def test_cjk_terminator_waits_for_the_next_fragment():
+    buffer = SentenceBuffer()
+    assert buffer.feed("你好。") == []
+    assert buffer.feed("”他说。") == []
+    assert buffer.feed("好") == ["你好。”他说。"]
+    assert buffer.flush() == ["好"]
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Multi-process inference workers with model-affinity routing.
+
+The front process (the one running the HTTP API) starts N worker processes
+and assigns every model of the catalog to exactly one of them. Jobs are
+routed by repo_id, so a model is only ever resident in the worker that owns
+it and the whole catalog can be served without loading it N times.
+
+Each worker runs jobs on its own thread pool, so replicas of a model
+(see model_pool.py) still run in parallel inside the owning worker.
+
+Partial results of a streaming job travel back on the same queue as job
+results, and are handed to a callback in the front process by the thread
+that reads that queue.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import signal
+import threading
+import time
+import zlib
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+from queue import Empty
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    from backend.inference import InferenceQueueFull
+except ImportError:
+    from inference import InferenceQueueFull
+
+
+def assign_models(catalog: Iterable[str], num_workers: int) -> Dict[str, int]:
+    """Spread the catalog round-robin over the workers, in catalog order."""
+    assignment = {}
+    for index, repo_id in enumerate(dict.fromkeys(catalog)):
+        assignment[repo_id] = index % num_workers
+    return assignment
+
+
+# In a worker process: the queue results and stream items are sent on
+_worker_responses = None
+
+
+class _StreamSink:
+    """
+    Sink of a stream opened with ShardedInferenceExecutor.open_stream,
+    passed to a job and used in the worker that runs it.
+    """
+
+    def __init__(self, stream_id: int):
+        self.stream_id = stream_id
+
+    def put(self, item: Any) -> None:
+        if isinstance(item, tuple):
+            item = tuple(
+                _picklable_exception(x) if isinstance(x, BaseException) else x for x in item
+            )
+        # ok=None marks a stream item rather than the result of a job
+        _worker_responses.put((None, self.stream_id, None, item))
+
+
+def _worker_main(worker_index: int, threads: int, requests, responses) -> None:
+    global _worker_responses
+    # Ctrl-C is handled by the front process, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_responses = responses
+
+    executor = ThreadPoolExecutor(
+        max_workers=threads, thread_name_prefix=f"tts-worker-{worker_index}"
+    )
+
+    def run(job_id: int, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            responses.put((worker_index, job_id, False, _picklable_exception(e)))
+        else:
+            responses.put((worker_index, job_id, True, result))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        executor.submit(run, *job)
+
+    executor.shutdown(wait=True)
+
+
+def _picklable_exception(e: BaseException) -> BaseException:
+    # Exceptions travel back through a queue; keep the type when it can be
+    # pickled (ValueError, RuntimeError, ...) and fall back to RuntimeError.
+    try:
+        ForkingPickler.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _resolve(future: Future, ok: bool, result: Any) -> None:
+    try:
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(result)
+    except InvalidStateError:
+        # The caller cancelled (e.g. the client disconnected)
+        pass
+
+
+class _Worker:
+    def __init__(self, index: int, threads: int, ctx, responses):
+        self.index = index
+        self.threads = threads
+        self.requests = ctx.Queue()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(index, threads, self.requests, responses),
+            name=f"tts-inference-worker-{index}",
+            daemon=True,
+        )
+        self.pending: Dict[int, Future] = {}
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+
+class ShardedInferenceExecutor:
+    """
+    Routes jobs to worker processes by repo_id.
+
+    Args:
+        num_workers: Number of worker processes
+        threads_per_worker: Jobs each worker runs at the same time
+        catalog: All repo_ids that can be requested, assigned up front
+        max_queue: Maximum outstanding jobs per worker, 0 = unlimited
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        threads_per_worker: int,
+        catalog: Iterable[str],
+        max_queue: int = 0,
+    ):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._responses = self._ctx.Queue()
+        self._assignment = assign_models(catalog, num_workers)
+        self._threads_per_worker = threads_per_worker
+        self._max_queue = max_queue
+        self._job_ids = itertools.count()
+        self._stream_ids = itertools.count()
+        # stream id -> callback receiving its items, until the stream is closed
+        self._streams: Dict[int, Callable[[Any], None]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._manager = None
+        self._workers: List[_Worker] = []
+        for index in range(num_workers):
+            worker = _Worker(index, threads_per_worker, self._ctx, self._responses)
+            worker.process.start()
+            self._workers.append(worker)
+
+        self._reader = threading.Thread(
+            target=self._read_responses, name="tts-inference-router", daemon=True
+        )
+        self._reader.start()
+
+    def worker_for(self, repo_id: str) -> int:
+        index = self._assignment.get(repo_id)
+        if index is None:
+            # Not in the catalog: still route it to a stable worker
+            index = zlib.crc32(repo_id.encode("utf-8")) % len(self._workers)
+        return index
+
+    def submit(self, repo_id: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run fn(*args, **kwargs) in the worker that owns repo_id."""
+        return self.submit_to(self.worker_for(repo_id), fn, *args, **kwargs)
+
+    def submit_to(self, index: int, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference workers are shut down")
+            worker = self._workers[index]
+            if self._max_queue and len(worker.pending) >= self._max_queue:
+                raise InferenceQueueFull(
+                    f"Inference worker {index} has {len(worker.pending)} jobs outstanding, try again later."
+                )
+            job_id = next(self._job_ids)
+            worker.pending[job_id] = future
+        worker.requests.put((job_id, fn, args, kwargs))
+        return future
+
+    async def run(self, repo_id: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(repo_id, fn, *args, **kwargs))
+
+    async def run_on_all(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> List[Any]:
+        """Run fn in every worker, e.g. to collect per-worker statistics."""
+        futures = [
+            asyncio.wrap_future(self.submit_to(index, fn, *args, **kwargs))
+            for index in range(len(self._workers))
+        ]
+        return await asyncio.gather(*futures)
+
+    def open_stream(self, deliver: Callable[[Any], None]):
+        """
+        Sink and cancel event that can be passed to a job in a worker, used
+        to stream partial results back to the front process.
+
+        deliver is called with every item the job puts on the sink, on the
+        thread reading worker responses, so it must not block. Returns
+        (sink, cancelled, close); after close() items are dropped.
+        """
+        with self._lock:
+            if self._manager is None:
+                self._manager = self._ctx.Manager()
+            manager = self._manager
+            stream_id = next(self._stream_ids)
+            self._streams[stream_id] = deliver
+
+        def close() -> None:
+            with self._lock:
+                self._streams.pop(stream_id, None)
+
+        return _StreamSink(stream_id), manager.Event(), close
+
+    def _read_responses(self) -> None:
+        last_check = time.monotonic()
+        while True:
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                index, job_id, ok, result = self._responses.get(timeout=1.0)
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if ok is None:
+                with self._lock:
+                    deliver = self._streams.get(job_id)
+                if deliver is not None:
+                    deliver(result)
+                continue
+            with self._lock:
+                worker = self._workers[index]
+                future = worker.pending.pop(job_id, None)
+                if ok:
+                    worker.completed += 1
+                else:
+                    worker.failed += 1
+            if future is not None:
+                _resolve(future, ok, result)
+            if self._closed and not any(w.pending for w in self._workers):
+                return
+
+    def _check_workers(self) -> None:
+        # Fail the jobs of a worker that died and start a replacement, which
+        # reloads its models lazily on the next request.
+        with self._lock:
+            if self._closed:
+                return
+            for index, worker in enumerate(self._workers):
+                if worker.process.is_alive():
+                    continue
+                lost = list(worker.pending.values())
+                replacement = _Worker(index, self._threads_per_worker, self._ctx, self._responses)
+                replacement.restarts = worker.restarts + 1
+                replacement.completed = worker.completed
+                replacement.failed = worker.failed + len(lost)
+                replacement.process.start()
+                self._workers[index] = replacement
+                error = RuntimeError(
+                    f"Inference worker {index} exited with code {worker.process.exitcode}"
+                )
+                for future in lost:
+                    _resolve(future, False, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models_per_worker = [0] * len(self._workers)
+            for index in self._assignment.values():
+                models_per_worker[index] += 1
+            return {
+                "mode": "processes",
+                "threads_per_worker": self._threads_per_worker,
+                "max_queue": self._max_queue,
+                "workers": [
+                    {
+                        "index": worker.index,
+                        "pid": worker.process.pid,
+                        "alive": worker.process.is_alive(),
+                        "assigned_models": models_per_worker[worker.index],
+                        "outstanding": len(worker.pending),
+                        "completed": worker.completed,
+                        "failed": worker.failed,
+                        "restarts": worker.restarts,
+                    }
+                    for worker in self._workers
+                ],
+            }
+
+    def shutdown(self, timeout: Optional[float] = 5.0) -> None:
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.requests.put(None)
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self._manager is not None:
+            self._manager.shutdown()
@@ -32,4 +32,7 @@ sleep 2
 echo "Starting FastAPI server..."
 
 # Start the application
+# Keep a single uvicorn worker: to use more cores set TTS_INFERENCE_PROCESSES,
+# which shards the model catalog across inference worker processes so each
+# model is loaded only once.
 exec python3 -m uvicorn backend.app:app --host 0.0.0.0 --port 8000 --workers 1